@@ -0,0 +1,288 @@
+# Batch version of query_moves.py for checking thousands of movesets at once (e.g. a team
+# builder export). The learnsets are loaded into a NumPy boolean matrix with one row per
+# move and one column per species, so a whole chunk of movesets is answered with one
+# gather and one AND-reduction instead of one intersection per moveset. Movesets are read
+# and answered a chunk at a time, so memory stays the same however long the input is. The
+# per-moveset Python work is kept to a minimum as well: a chunk of JSON Lines is decoded
+# with one json.loads, its move names are turned into IDs with one dictionary lookup each
+# and scattered into the ID array in one step, and the results are written from JSON
+# strings encoded once per move and species name. An empty moveset matches no Pokémon
+# (as in LearnsetIndex.query_mask).
+#
+# Input is a stream of movesets, one per line, either JSON Lines (each line a list of move
+# names, or an object with a "moves" list) or CSV (each row is the moves of one set):
+#   python batch_query.py movesets.jsonl [--output results.jsonl] [--method TM ...]
+#   python batch_query.py movesets.csv --format csv
+#   python batch_query.py movesets.jsonl --max-level 30 --version GS
+#   python batch_query.py movesets.jsonl --type Water --stat "Speed>=80"   # see species_table.py
+#   python batch_query.py --benchmark 1000000   # the vectorized step, then end to end
+# Each result is written as one JSON line: {"moves": [...], "pokemon": [...]} (or
+# {"moves": [...], "count": N} with --count-only, or {"moves": [...], "error": ...}).
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+
+import numpy as np # type: ignore
+
+from learnset_index import load_index, methods, versions
+from move_registry import display_name
+from species_table import comparisons, load_species_table, parse_stat_filter
+
+# Movesets answered together in one vectorized step
+default_chunk_size = 8192
+
+
+class LearnsetMatrix:
+    # Builds the matrix from a LearnsetIndex, only counting the given ways of learning
+    # each move (all of them if none are given) in the given game version (or any of
+    # them), and with a max_level only level up moves learned by that level. species_mask is a
+    # boolean array with one entry per species of the index; species set to False never match
+    def __init__(self, index, learn_methods=None, max_level=None, version=None, species_mask=None):
+        self.index = index
+        self.species = np.array(index.species, dtype=object)
+
+        # Two extra rows at the end: one of all True to pad movesets with fewer moves, and
+        # one of all False for empty movesets and movesets with an unknown move
+        self.matrix = np.zeros((len(index.moves) + 2, len(index.species)), dtype=bool)
+        for move_id, move_name in enumerate(index.moves):
+            mask = index.learners_mask(move_name, learn_methods, max_level, version)
+            self.matrix[move_id, [index.species_ids[name] for name in index.decode(mask)]] = True
+        self.padding_id = len(index.moves)
+        self.matrix[self.padding_id] = True
+        self.nothing_id = len(index.moves) + 1
+        # Species filtered out by their attributes are cleared from every row at once, so
+        # the queries themselves don't change
+        if species_mask is not None:
+            self.matrix[:, ~species_mask] = False
+
+        # Move name as written in the input -> move ID (-1 for an unknown move)
+        self.resolved = ResolvedMoves(index)
+        # Name as written in the input -> its JSON, and species name JSON by species ID
+        self.encoded = EncodedNames()
+        self.species_json = np.array([json.dumps(name) for name in index.species], dtype=object)
+
+    # Returns the move ID for a name as it is written in the input (display name or URL
+    # name, any letter case), or None if there is no such move
+    def move_id(self, name):
+        move_id = self.resolved[name]
+        return None if move_id < 0 else move_id
+
+    # Answers a chunk of movesets given as an array of move IDs (one row per moveset,
+    # padded with padding_id). Returns a boolean array with one row per moveset and one
+    # column per species
+    def query_ids(self, move_ids):
+        return np.logical_and.reduce(self.matrix[move_ids], axis=1)
+
+    # Array of move IDs for a chunk of movesets (lists of move names): one row per moveset,
+    # padded with padding_id. Empty movesets and movesets with an unknown move get the row
+    # of nothing_id. Also returns the first unknown move name of each row that has one
+    def chunk_ids(self, movesets):
+        lengths = np.fromiter(map(len, movesets), dtype=np.intp, count=len(movesets))
+        names = list(itertools.chain.from_iterable(movesets))
+        flat_ids = np.fromiter(map(self.resolved.__getitem__, names), dtype=np.intp, count=len(names))
+
+        # Row and column of every name in the flattened list
+        rows = np.repeat(np.arange(len(movesets)), lengths)
+        columns = np.arange(len(names)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        move_ids = np.full((len(movesets), max(int(lengths.max(initial=0)), 1)), self.padding_id, dtype=np.intp)
+        move_ids[rows, columns] = flat_ids
+
+        unknown = {}
+        for position in np.flatnonzero(flat_ids < 0)[::-1]:
+            unknown[int(rows[position])] = names[position]
+        move_ids[lengths == 0, 0] = self.nothing_id
+        move_ids[move_ids < 0] = self.nothing_id
+        return move_ids, unknown
+
+    # Answers a chunk of movesets (lists of move names). Returns the results as JSON Lines
+    # text, one line per moveset (the same as json.dumps of each result dict)
+    def query_chunk(self, movesets, count_only=False):
+        move_ids, unknown = self.chunk_ids(movesets)
+        result = self.query_ids(move_ids)
+        encoded = self.encoded
+
+        lines = []
+        if count_only:
+            for row, (moves, count) in enumerate(zip(movesets, result.sum(axis=1).tolist())):
+                moves_json = ", ".join(map(encoded.__getitem__, moves))
+                if row in unknown:
+                    lines.append(f'{{"moves": [{moves_json}], "error": {not_found_json(unknown[row])}}}\n')
+                else:
+                    lines.append(f'{{"moves": [{moves_json}], "count": {count}}}\n')
+            return "".join(lines)
+
+        # Split the species of every row out of one nonzero() call over the whole chunk
+        rows, columns = np.nonzero(result)
+        bounds = np.searchsorted(rows, np.arange(len(movesets) + 1)).tolist()
+        names = self.species_json[columns]
+        for row, moves in enumerate(movesets):
+            moves_json = ", ".join(map(encoded.__getitem__, moves))
+            if row in unknown:
+                lines.append(f'{{"moves": [{moves_json}], "error": {not_found_json(unknown[row])}}}\n')
+            else:
+                lines.append(f'{{"moves": [{moves_json}], "pokemon": [{", ".join(names[bounds[row]:bounds[row + 1]])}]}}\n')
+        return "".join(lines)
+
+
+# Move name as written in the input -> move ID in the index, or -1 if there is no such move.
+# A name is resolved (display name or URL name, any letter case) the first time it is
+# looked up, so a chunk is turned into IDs with plain dictionary lookups
+class ResolvedMoves(dict):
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def __missing__(self, name):
+        move_name = display_name(name)
+        move_id = self[name] = self.index.move_ids.get(move_name, -1) if move_name else -1
+        return move_id
+
+
+# Name as written in the input -> its JSON, encoded the first time it is looked up
+class EncodedNames(dict):
+    def __missing__(self, name):
+        encoded = self[name] = json.dumps(name)
+        return encoded
+
+
+# JSON of the error written for a moveset with an unknown move
+def not_found_json(name):
+    return json.dumps(f'Move "{name}" not found in data.')
+
+
+# Boolean array over the species of the index: True for the Pokémon that have every one of
+# the types and pass every stat filter. Each filter is one comparison down a column of the
+# species table
+def attribute_mask(index, types=(), stat_filters=()):
+    table = load_species_table()
+    rows = np.ones(len(table), dtype=bool)
+    for type_name in types:
+        rows &= np.array([type_name.lower() in (t.lower() for t in species_types)
+                          for species_types in table.columns["types"]], dtype=bool)
+    for stat, symbol, value in stat_filters:
+        rows &= comparisons[symbol](np.asarray(table.columns[stat]), value)
+
+    # Row of each index species in the table (-1 for species that aren't in it)
+    table_rows = np.array([table.ids.get(name, -1) for name in index.species], dtype=np.intp)
+    return np.where(table_rows >= 0, rows[table_rows], False)
+
+
+# Reads movesets (lists of move names) from a JSON Lines stream. Lines are decoded a batch
+# at a time as one JSON array. If that fails or doesn't give one list or object per line
+# (some line isn't one whole moveset), the batch is decoded line by line instead, so a
+# broken line raises the same error as before
+def read_jsonl(stream, batch_size=default_chunk_size):
+    lines = filter(None, (line.strip() for line in stream))
+    while True:
+        batch = list(itertools.islice(lines, batch_size))
+        if not batch:
+            return
+        try:
+            values = json.loads("[" + ",".join(batch) + "]")
+        except json.JSONDecodeError:
+            values = None
+        if values is None or len(values) != len(batch) or \
+                not all(isinstance(value, (list, dict)) for value in values):
+            values = [json.loads(line) for line in batch]
+        for data in values:
+            yield data["moves"] if isinstance(data, dict) else data
+
+
+# Reads movesets from a CSV stream (empty cells are skipped)
+def read_csv(stream):
+    for row in csv.reader(stream):
+        moves = [cell.strip() for cell in row if cell.strip()]
+        if moves:
+            yield moves
+
+
+# Answers every moveset from the reader, a chunk at a time, writing one JSON line each
+def run_batch(lookup, movesets, output, chunk_size=default_chunk_size, count_only=False):
+    total = 0
+    while True:
+        chunk = list(itertools.islice(movesets, chunk_size))
+        if not chunk:
+            return total
+        output.write(lookup.query_chunk(chunk, count_only))
+        total += len(chunk)
+
+
+# Times random 4-move sets and prints the rates: the vectorized step alone, then end to end
+# (decoding JSON Lines, resolving the names, answering and writing every result)
+def benchmark(lookup, count, chunk_size=default_chunk_size):
+    rng = np.random.default_rng(0)
+    move_ids = rng.integers(0, lookup.padding_id, size=(count, 4))
+    start = time.perf_counter()
+    for first in range(0, count, chunk_size):
+        lookup.query_ids(move_ids[first:first + chunk_size]).sum(axis=1)
+    seconds = time.perf_counter() - start
+    print(f"{count} movesets in {seconds:.3f}s ({count / seconds:,.0f} movesets/s, vectorized step only)")
+
+    moves = lookup.index.moves
+    lines = io.StringIO("".join(json.dumps([moves[move_id] for move_id in row]) + "\n" for row in move_ids.tolist()))
+    start = time.perf_counter()
+    run_batch(lookup, read_jsonl(lines, chunk_size), io.StringIO(), chunk_size)
+    seconds = time.perf_counter() - start
+    print(f"{count} movesets in {seconds:.3f}s ({count / seconds:,.0f} movesets/s, end to end)")
+
+
+# Runs a batch with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Answer many \"which Pokémon learn all of these moves\" queries at once")
+    arg_parser.add_argument("input", nargs="?", help="file of movesets (default: standard input)")
+    arg_parser.add_argument("--output", help="file to write the results to (default: standard output)")
+    arg_parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="input format (default: from the file extension, otherwise jsonl)")
+    arg_parser.add_argument("--method", action="append", choices=methods, dest="methods",
+                            help="only count this way of learning the moves (can be given more than once)")
+    arg_parser.add_argument("--max-level", type=int,
+                            help="only count level up moves learned at this level or below")
+    arg_parser.add_argument("--version", choices=versions,
+                            help="only count what can be learned in this game version: GS (Gold/Silver) or C "
+                                 "(Crystal) (default: any Gen II game)")
+    arg_parser.add_argument("--type", action="append", dest="types", default=[],
+                            help="only keep Pokémon of this type (can be given more than once)")
+    arg_parser.add_argument("--stat", action="append", dest="stats", default=[],
+                            help='only keep Pokémon whose base stat passes this filter, e.g. "Speed>=80"')
+    arg_parser.add_argument("--chunk-size", type=int, default=default_chunk_size,
+                            help="movesets answered together (bounds memory use)")
+    arg_parser.add_argument("--count-only", action="store_true",
+                            help="write how many Pokémon match instead of their names")
+    arg_parser.add_argument("--benchmark", type=int, metavar="N",
+                            help="time N random 4-move sets instead of reading input")
+    args = arg_parser.parse_args(argv)
+
+    index = load_index()
+    species_mask = None
+    if args.types or args.stats:
+        try:
+            species_mask = attribute_mask(index, args.types, [parse_stat_filter(text) for text in args.stats])
+        except (ValueError, FileNotFoundError) as error:
+            arg_parser.error(str(error))
+    lookup = LearnsetMatrix(index, args.methods, args.max_level, args.version, species_mask)
+
+    if args.benchmark:
+        benchmark(lookup, args.benchmark, args.chunk_size)
+        return
+
+    input_format = args.format or ("csv" if args.input and args.input.endswith(".csv") else "jsonl")
+    reader = read_csv if input_format == "csv" else read_jsonl
+
+    input_stream = open(args.input, "r", newline="") if args.input else sys.stdin
+    output_stream = open(args.output, "w") if args.output else sys.stdout
+    try:
+        run_batch(lookup, reader(input_stream), output_stream, args.chunk_size, args.count_only)
+    finally:
+        if args.input:
+            input_stream.close()
+        if args.output:
+            output_stream.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Load test for query_service.py. Starts the service in this process and sends it a
+# stream of requests from many concurrent keep-alive connections, then prints the request
+# rate and the p50/p99 latency. The clients run in a separate process with their own event
+# loop, so the time spent sending requests and reading answers isn't taken from the
+# service (and the numbers are what a client on another core would see). Everything runs
+# on this machine.
+#   python bench_service.py [--requests 20000] [--concurrency 64] [--distinct 500]
+# --distinct sets how many different move sets are queried (fewer = more cache hits).
+
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import random
+import time
+from urllib.parse import quote
+
+from learnset_index import load_index
+from query_service import intersect, start_service
+
+
+# Sends the given request paths over one connection, one after another, recording the
+# latency of each in latencies
+async def client(host, port, paths, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for path in paths:
+        start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+# Runs in the client process: sends the paths over `concurrency` connections at once and
+# puts (latencies, seconds) on results
+def run_clients(host, port, paths, concurrency, results):
+    async def send_all():
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(host, port, paths[i::concurrency], latencies) for i in range(concurrency)))
+        return latencies, time.perf_counter() - start
+
+    results.put(asyncio.run(send_all()))
+
+
+# Waits for the client process to put its results on the queue
+def wait_for_clients(process, results):
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"the client process exited without results (exit code {process.exitcode})")
+
+
+# Returns the value at the given percentile of a sorted list
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def run(total_requests, concurrency, distinct, host="127.0.0.1", port=0):
+    server = await start_service(host, port)
+    port = server.sockets[0].getsockname()[1]
+
+    # Random 1-4 move sets, with some prefix searches and learnset lookups mixed in
+    index = load_index()
+    rng = random.Random(0)
+    pool = []
+    for _ in range(distinct):
+        kind = rng.random()
+        if kind < 0.8:
+            moves = ",".join(rng.sample(index.moves, rng.randint(1, 4)))
+            pool.append("/intersect?moves=" + quote(moves))
+        elif kind < 0.9:
+            pool.append("/pokemon/" + quote(rng.choice(index.species)))
+        else:
+            pool.append("/moves?prefix=" + quote(rng.choice(index.moves)[:2]))
+    paths = [rng.choice(pool) for _ in range(total_requests)]
+
+    results = multiprocessing.Queue()
+    clients = multiprocessing.Process(target=run_clients, args=(host, port, paths, concurrency, results))
+    async with server:
+        clients.start()
+        latencies, seconds = await asyncio.get_running_loop().run_in_executor(None, wait_for_clients, clients,
+                                                                              results)
+    clients.join()
+
+    latencies.sort()
+    info = intersect.cache_info()
+    print(f"{len(latencies)} requests over {concurrency} connections in {seconds:.2f}s "
+          f"({len(latencies) / seconds:,.0f} requests/s)")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms")
+    print(f"intersection cache: {info.hits} hits, {info.misses} misses")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Load test the local learnset query service")
+    arg_parser.add_argument("--requests", type=int, default=20000, help="total number of requests")
+    arg_parser.add_argument("--concurrency", type=int, default=64, help="number of concurrent connections")
+    arg_parser.add_argument("--distinct", type=int, default=500, help="number of different requests")
+    args = arg_parser.parse_args(argv)
+    asyncio.run(run(args.requests, args.concurrency, args.distinct))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+# Offline benchmark suite for the extraction, build and query code. It times:
+#   parse      - parse_page() on each fixture page, with every parser backend
+#   extract    - parsing the whole fixture corpus one page after another
+#   build      - turning every move record into the JSON, binary and shard artifacts (in
+#                memory, nothing is written)
+#   query      - loading the learnset index, then 1-move and 4-move intersections
+# and prints the results (or writes them with --output) as JSON, so runs on two commits
+# can be compared.
+#
+# The parse and extract benchmarks run on the pages kept in benchmark_pages/ (one
+# <move>.shtml per fixture move). Recorded serebii pages replace the committed ones with:
+#   python benchmarks.py --record-fixtures [--archive-mode replay --archive page_archive.zip]
+# The committed pages are synthetic, not recorded: they are rendered from the committed move
+# records and docs/species_table.json in the attackdex layout the parsing code reads (the
+# three move dropdowns, the section anchors and the dextable rows), marked with a comment
+# on their first line and written again with --synthesize-fixtures. They are only there to
+# time the parser on pages of realistic size and shape. They are not a regression corpus:
+# parsing them back only shows that the parser undoes the page generator, and says nothing
+# about serebii's real markup. So only recorded pages are checked against the committed move
+# records (fixture_check in the results; --check runs only that and exits with 1 on a
+# mismatch, or 2 if no recorded page is there to check). The build and query benchmarks
+# only need the committed move records and docs/move_data.json.
+#   python benchmarks.py [--repeat 20] [--output results.json]
+
+import argparse
+import datetime
+import html as html_text
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from build_manifest import script_dir
+
+# Folder the fixture pages are recorded to
+fixtures_folder = os.path.join(script_dir, "benchmark_pages")
+
+# Moves whose pages make up the fixture corpus, chosen to cover every kind of section:
+# level up only, TM, HM, egg moves, special events, Crystal-only level up learners and
+# moves few or many Pokémon learn
+fixture_moves = ["curse", "surf", "barrier", "tackle", "psychic", "raindance", "extremespeed",
+                 "dizzypunch", "sacredfire", "flamethrower"]
+
+# First line of a synthetic fixture page
+synthetic_marker = "<!-- synthetic fixture page rendered by benchmarks.py from the move records -->"
+
+
+# Runs fn the given number of times and returns its timings in milliseconds
+def time_runs(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+# Summary of a list of timings in milliseconds
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 4),
+    }
+
+
+# Reads the fixture pages: move -> page HTML (moves without a page are left out)
+def load_fixtures(folder=fixtures_folder):
+    pages = {}
+    for move in fixture_moves:
+        path = os.path.join(folder, move + ".shtml")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                pages[move] = file.read()
+    return pages
+
+
+# Whether every fixture page is synthetic ("synthetic"), recorded ("recorded") or a mix ("mixed")
+def fixture_source(pages):
+    kinds = {"synthetic" if html.startswith(synthetic_marker) else "recorded" for html in pages.values()}
+    return kinds.pop() if len(kinds) == 1 else "mixed" if kinds else None
+
+
+# One dextable data row: the species columns (see extract_helper_funcs.parse_species_row)
+# followed by any extra columns (the level columns of the level up table)
+def species_row_html(table, name, extra=()):
+    row = table.ids[name]
+    dex = table.columns["dex"][row]
+    types = "".join(f'<img src="/pokedex-bw/type/{type_name.lower()}.gif" alt="{type_name}-type">'
+                    for type_name in table.columns["types"][row])
+    cells = [f"#{dex:03}", f'<img src="/pokearth/sprites/gs/{dex:03}.png">',
+             f'<a href="/pokedex-gs/{dex:03}.shtml">{html_text.escape(name)}</a>', types]
+    cells += [str(table.columns[stat][row]) for stat in table.columns["stats"]] + list(extra)
+    return "<tr>" + "".join(f'<td class="fooinfo">{cell}</td>' for cell in cells) + "</tr>\n"
+
+
+# One learnset section: its anchor, the text that names it and its dextable (with the two
+# header rows the parsing code skips)
+def section_html(anchor, title, rows, level_columns=False):
+    header = '<td class="fooevo">No.</td><td class="fooevo">Pic</td><td class="fooevo">Name</td>' \
+             '<td class="fooevo">Type</td><td class="fooevo" colspan="6">Base Stats</td>'
+    subheader = "".join(f'<td class="fooevo">{stat}</td>' for stat in ["HP", "Att", "Def", "S.Att", "S.Def", "Spd"])
+    if level_columns:
+        header += '<td class="fooevo" colspan="2">Level</td>'
+        subheader += '<td class="fooevo">G/S</td><td class="fooevo">Crystal</td>'
+    return (f'<p><a name="{anchor}"></a><b>{title}</b></p>\n<table class="dextable">\n'
+            f"<tr>{header}</tr>\n<tr>{subheader}</tr>\n{''.join(rows)}</table>\n")
+
+
+# Renders a synthetic attackdex page from a move record (see the top of this file)
+def render_fixture_page(move_name, record, table, move_names):
+    options = "".join(f'<option value="/attackdex-gs/{move}.shtml">{html_text.escape(name)}</option>'
+                      for move, name in move_names.items())
+    parts = [synthetic_marker, f"\n<html><head><title>Serebii.net AttackDex - {move_name}</title></head><body>\n"]
+    parts += [f'<form><select name="SelectURL"><option>AttackDex: {label}</option>{options}</select></form>\n'
+              for label in ["A - G", "H - R", "S - Z"]]
+    parts.append(f'<table class="dextab"><tr><td class="fooevo">{html_text.escape(move_name)}</td></tr></table>\n')
+
+    def levels(values):
+        return "<br>".join(f"Lv. {level}" for level in values) or "-"
+
+    if record.levelup is not None:
+        rows = [species_row_html(table, entry.pokemon, [levels(entry.levels_GS), levels(entry.levels_C)])
+                for entry in record.levelup]
+        parts.append(section_html("level", "Pokémon that learn it by Level Up", rows, level_columns=True))
+    if record.TM is not None:
+        parts.append(section_html("TM", "Pokémon that learn it by TM/HM",
+                                  [species_row_html(table, name) for name in record.TM]))
+    if record.breeding is not None:
+        parts.append(section_html("egg", "Pokémon that learn it by Breeding",
+                                  [species_row_html(table, name) for name in record.breeding]))
+    if record.event is not None:
+        parts.append(section_html("TM", "Pokémon that learn it by an Event or a special way",
+                                  [species_row_html(table, name) for name in record.event]))
+    parts.append('<table><tr><td class="foot">All content is &copy; Serebii.net</td></tr></table></body></html>\n')
+    return "".join(parts)
+
+
+# Reads the committed record of a move
+def read_move_record(move):
+    from build_artifacts import folder_path
+    from extract_helper_funcs import MoveRecord
+
+    with open(os.path.join(folder_path, move + ".json"), "r", encoding="utf-8") as file:
+        return MoveRecord.from_json(file.read())[2]
+
+
+# Writes a synthetic page for every fixture move into the fixtures folder
+def synthesize_fixtures(folder=fixtures_folder):
+    from move_registry import load_move_names
+    from species_table import load_species_table
+
+    move_names = load_move_names()
+    table = load_species_table()
+    os.makedirs(folder, exist_ok=True)
+    for move in fixture_moves:
+        html = render_fixture_page(move_names[move], read_move_record(move), table, move_names)
+        with open(os.path.join(folder, move + ".shtml"), "w", encoding="utf-8", newline="\n") as file:
+            file.write(html)
+        print(f"Wrote {move} ({len(html)} characters)")
+
+
+# Parses every recorded fixture page (synthetic ones are skipped, see the top of this file)
+# and compares the sections with the committed move record. Returns the moves that were
+# checked and the ones whose page gives a different record, with the sections that differ
+def check_fixtures(pages):
+    from extract_helper_funcs import MoveRecord, parse_page
+    from move_registry import load_move_names
+
+    move_names = load_move_names()
+    checked = [move for move, html in pages.items() if not html.startswith(synthetic_marker)]
+    mismatches = {}
+    for move in checked:
+        html = pages[move]
+        parsed = MoveRecord.from_json(parse_page(move, move_names[move], html)[0])[2]
+        committed = read_move_record(move)
+        sections = [section for section in ["levelup", "TM", "breeding", "event"]
+                    if getattr(parsed, section) != getattr(committed, section)]
+        if sections:
+            mismatches[move] = sections
+    return checked, mismatches
+
+
+# Downloads (or replays from the page archive) every fixture page into the fixtures folder
+def record_fixtures(folder=fixtures_folder):
+    import page_archive
+    from generations import gen2
+
+    os.makedirs(folder, exist_ok=True)
+    for move in fixture_moves:
+        html = page_archive.get_page(gen2.page_url(move))
+        with open(os.path.join(folder, move + ".shtml"), "w", encoding="utf-8") as file:
+            file.write(html)
+        print(f"Recorded {move} ({len(html)} characters)")
+
+
+# Times parse_page() on each fixture page with every parser backend that can be used here
+def benchmark_parse(pages, repeat):
+    from extract_helper_funcs import make_soup, parse_page, parser_backends
+    from move_registry import load_move_names
+
+    move_names = load_move_names()
+    results = {}
+    for backend in parser_backends:
+        try:
+            make_soup("<p></p>", backend)
+        except Exception as error:
+            results[backend] = {"skipped": str(error)}
+            continue
+        results[backend] = {move: summarize(time_runs(lambda: parse_page(move, move_names[move], html, backend),
+                                                      repeat))
+                            for move, html in pages.items()}
+    return results
+
+
+# Times parsing the whole corpus one page after another with the default backend
+def benchmark_extract(pages, repeat):
+    from extract_helper_funcs import parse_page
+    from move_registry import load_move_names
+
+    move_names = load_move_names()
+
+    def extract_all():
+        for move, html in pages.items():
+            parse_page(move, move_names[move], html)
+
+    result = summarize(time_runs(extract_all, repeat))
+    result["pages"] = len(pages)
+    return result
+
+
+# Times building every artifact from the move records, without writing anything
+def benchmark_build(repeat):
+    from build_artifacts import build_move_data, read_records
+    from learnset_binary import build_binary
+    from learnset_shards import build_shards
+
+    records = read_records()
+    move_data, _, _, _ = build_move_data(records)
+
+    def build_json():
+        detailed, names_only, species_learnsets, _ = build_move_data(records)
+        json.dumps(detailed, indent=4)
+        json.dumps(names_only, indent=4)
+        json.dumps(species_learnsets, ensure_ascii=False, separators=(",", ":"))
+
+    return {
+        "records": len(records),
+        "read_records": summarize(time_runs(read_records, repeat)),
+        "json": summarize(time_runs(build_json, repeat)),
+        "binary": summarize(time_runs(lambda: build_binary(move_data), repeat)),
+        "shards": summarize(time_runs(lambda: build_shards(move_data), repeat)),
+    }
+
+
+# Times loading the index, answering random 1-move and 4-move queries and looking up the
+# learnsets of random Pokémon
+def benchmark_query(repeat, queries=2000):
+    from learnset_index import LearnsetIndex
+
+    index = LearnsetIndex.load()
+    rng = random.Random(0)
+    results = {"load_index": summarize(time_runs(LearnsetIndex.load, repeat))}
+    for size in [1, 4]:
+        movesets = [rng.sample(index.moves, size) for _ in range(queries)]
+        timings = []
+        for moves in movesets:
+            start = time.perf_counter()
+            index.query(moves)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"query_{size}_moves"] = summarize(timings)
+
+    # Everything one Pokémon learns: one lookup in the reverse index
+    from species_learnsets import SpeciesLearnsets
+
+    learnsets = SpeciesLearnsets.load()
+    timings = []
+    for species in [rng.choice(index.species) for _ in range(queries)]:
+        start = time.perf_counter()
+        learnsets.learnset(species)
+        timings.append((time.perf_counter() - start) * 1000)
+    results["species_learnset"] = summarize(timings)
+    return results
+
+
+# Current git commit, or None if it can't be found
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=script_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Result of check_fixtures for the results JSON
+def fixture_check(pages):
+    checked, mismatches = check_fixtures(pages)
+    if not checked:
+        return {"skipped": "no recorded fixture pages (synthetic pages aren't checked), run with "
+                           "--record-fixtures on real pages first"}
+    return {"checked": checked, "mismatches": mismatches}
+
+
+# Runs every benchmark and returns the results
+def run_benchmarks(repeat=20):
+    pages = load_fixtures()
+    skipped = {"skipped": "no fixture pages, run with --synthesize-fixtures or --record-fixtures first"}
+    return {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "fixture_pages": sorted(pages),
+        "fixture_source": fixture_source(pages),
+        "fixture_check": fixture_check(pages),
+        "results": {
+            "parse": benchmark_parse(pages, repeat) if pages else skipped,
+            "extract": benchmark_extract(pages, repeat) if pages else skipped,
+            "build": benchmark_build(max(1, repeat // 4)),
+            "query": benchmark_query(repeat),
+        },
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run the offline benchmarks and print the results as JSON")
+    arg_parser.add_argument("--repeat", type=int, default=20, help="times each benchmark is run")
+    arg_parser.add_argument("--output", help="file to write the JSON results to (default: standard output)")
+    arg_parser.add_argument("--record-fixtures", action="store_true",
+                            help="record the fixture pages into benchmark_pages/ instead of benchmarking")
+    arg_parser.add_argument("--synthesize-fixtures", action="store_true",
+                            help="render synthetic fixture pages from the move records into benchmark_pages/ "
+                                 "instead of benchmarking")
+    arg_parser.add_argument("--check", action="store_true",
+                            help="only check that every recorded fixture page parses into its committed move "
+                                 "record")
+    arg_parser.add_argument("--archive-mode", help="page archive mode used when recording (off, record or replay)")
+    arg_parser.add_argument("--archive", help="path of the page archive file used when recording")
+    args = arg_parser.parse_args(argv)
+
+    if args.record_fixtures:
+        import page_archive
+        page_archive.configure(args.archive_mode, args.archive)
+        record_fixtures()
+        return
+    if args.synthesize_fixtures:
+        synthesize_fixtures()
+        return
+    if args.check:
+        checked, mismatches = check_fixtures(load_fixtures())
+        if not checked:
+            arg_parser.error("no recorded fixture pages to check (synthetic pages aren't checked), run with "
+                             "--record-fixtures on real pages first")
+        for move, sections in mismatches.items():
+            print(f"{move}: {', '.join(sections)} differ from the committed record")
+        if mismatches:
+            sys.exit(1)
+        print(f"Every recorded fixture page ({len(checked)}) parses into its committed move record")
+        return
+
+    results = json.dumps(run_benchmarks(args.repeat), indent=4)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Builds every file the web page and the query tools read, from the move records written
+# by extract_move.py, in one pass:
+#   docs/move_data.json           every move's learners by method, with level up levels
+#   docs/movedata_namesonly.json  every move's learners as one list, without duplicates
+#   docs/movelist.json            the display name of every move (typeahead on the web page)
+#   docs/move_index.json          the move name index (see move_registry.py)
+#   docs/learnset.bin             the binary learnset (see learnset_binary.py)
+#   docs/species_learnsets.json   every species' moves by method, with levels (see
+#                                 species_learnsets.py)
+#   docs/shards/                  the per-move and per-species shards (see learnset_shards.py)
+#   docs/species_table.json       dex number, types and base stats of every species (see
+#                                 species_table.py), once the records have those columns
+#
+# Each record file is read and parsed exactly once (the files are read in parallel), and
+# every output is made from that one parsed record, so the build does the same small
+# amount of work per record however many outputs or generations there are. Every output
+# is written atomically and only if its contents changed (see build_manifest.py).
+#   python build_artifacts.py
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from build_manifest import content_hash, load_manifest, save_manifest, script_dir, write_if_changed
+from extract_helper_funcs import MoveRecord
+from generations import gen2
+from learnset_binary import binary_path, build_binary
+from learnset_index import move_data_path
+from learnset_shards import write_shards
+from move_registry import build_move_index, load_move_index, load_move_names, move_index_path
+from species_learnsets import add_move_entry, load_species_learnsets, species_learnsets_path
+from species_table import build_species_table, compare_species_tables, load_species_table, species_table_path
+
+# Folder containing the move records written by extract_move.py
+folder_path = gen2.records_folder
+
+# Paths of the JSON files that are written
+docs_dir = os.path.dirname(move_data_path)
+namesonly_path = os.path.join(docs_dir, "movedata_namesonly.json")
+movelist_path = os.path.join(docs_dir, "movelist.json")
+
+# Files read at the same time
+read_workers = 8
+
+
+# Reads one record file: (file name, contents)
+def read_record(file_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        return os.path.basename(file_path), file.read()
+
+
+# Reads every record file in the folder, in parallel, in file name order (the order the
+# moves appear in the JSON files). The folder listing itself isn't used as the order: it
+# differs between file systems, so the same records would give different artifacts
+def read_records(folder=folder_path, workers=read_workers):
+    paths = [os.path.join(folder, filename) for filename in sorted(os.listdir(folder)) if filename.endswith(".json")]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(read_record, paths))
+
+
+# Entry of a move in move_data.json. Levels are stored as integers, one list per game
+# version (Gold/Silver, then Crystal), so Pokémon that only learn the move in one version
+# keep an empty list
+def detailed_entry(record):
+    return {
+        "Via Level Up": [
+            {"Pokemon": entry.pokemon, "Levels": [entry.levels_GS, entry.levels_C]}
+            for entry in record.levelup or []
+        ],
+        "Via TM": record.TM or [],
+        "Via Breeding": record.breeding or [],
+        "Via Special Event": record.event or []
+    }
+
+
+# Builds the contents of move_data.json, movedata_namesonly.json, species_learnsets.json
+# and species_table.json from the record files ((file name, contents) pairs). Returns
+# three dictionaries, move name -> entry, move name -> learners and species name ->
+# learnset, and the species table
+def build_move_data(records):
+    move_data = {}
+    names_only = {}
+    species_learnsets = {}
+    parsed = []
+    for _, text in records:
+        _, move_name, record = MoveRecord.from_json(text)
+        move_data[move_name] = detailed_entry(record)
+        # Level up, TM/HM, breeding and special event learners, in that order; learners()
+        # drops duplicates with an insertion ordered dictionary
+        names_only[move_name] = record.learners()
+        # The same entry, filed under each of its learners
+        add_move_entry(species_learnsets, move_name, move_data[move_name])
+        parsed.append(record)
+    return move_data, names_only, species_learnsets, build_species_table(parsed)
+
+
+# Builds every artifact and writes the ones that changed. Returns the number of records,
+# how many of them changed since the last build, the paths that were written and the
+# differences between the crawled species rows and the committed species table (the
+# table is kept as it is if there are any)
+def build_all(folder=folder_path):
+    manifest = load_manifest()
+    records = read_records(folder)
+    record_hashes = {filename: content_hash(text) for filename, text in records}
+    old_hashes = manifest.get("sources", {})
+    changed = sum(old_hashes.get(filename) != record_hash for filename, record_hash in record_hashes.items())
+
+    move_data, names_only, species_learnsets, species_table = build_move_data(records)
+    move_dict = load_move_names()
+    outputs = [
+        (move_data_path, json.dumps(move_data, indent=4)),
+        (namesonly_path, json.dumps(names_only, indent=4)),
+        (movelist_path, json.dumps(list(move_dict.values()), indent=4)),
+        (move_index_path, json.dumps(build_move_index(move_dict), ensure_ascii=False, separators=(",", ":"))),
+        (binary_path, build_binary(move_data)),
+        (species_learnsets_path, json.dumps(species_learnsets, ensure_ascii=False, separators=(",", ":"))),
+    ]
+    # Records crawled before the species columns were kept have no rows for the table. A
+    # table from crawled rows only replaces the committed one if they agree on every
+    # species both have (a page layout change that shifts a column would show up here)
+    differences = []
+    if species_table["name"]:
+        if os.path.exists(species_table_path):
+            differences = compare_species_tables(species_table, load_species_table().columns)
+        if not differences:
+            outputs.append((species_table_path, json.dumps(species_table, ensure_ascii=False, separators=(",", ":"))))
+    written = [path for path, contents in outputs if write_if_changed(path, contents, manifest)]
+    load_move_index.cache_clear()
+    load_species_table.cache_clear()
+    load_species_learnsets.cache_clear()
+
+    shard_manifest, shards_written = write_shards(move_data, build=manifest, species_learnsets=species_learnsets)
+    if shards_written:
+        written.append(os.path.join(docs_dir, "shards"))
+
+    manifest["sources"] = record_hashes
+    save_manifest(manifest)
+    return len(records), changed, written, differences
+
+
+# Builds the artifacts with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build every JSON, binary and shard file from the move records")
+    arg_parser.parse_args(argv)
+
+    count, changed, written, differences = build_all()
+    print(f"Read {count} move records ({changed} changed since the last build)")
+    for path in written:
+        print(f"Written: {os.path.relpath(path, script_dir)}")
+    if not written:
+        print("Every file is already up to date")
+    if differences:
+        print(f"\nThe crawled species rows differ from {os.path.relpath(species_table_path, script_dir)} in "
+              f"{len(differences)} place(s), so it was kept as it is:")
+        for name, column, crawled, committed in differences[:20]:
+            print(f"  {name} {column}: crawled {crawled}, table {committed}")
+
+
+if __name__ == "__main__":
+    main()
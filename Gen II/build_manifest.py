@@ -0,0 +1,86 @@
+# Content-hash manifest used for incremental builds. The manifest remembers a hash of
+# every downloaded page, every per-move record and every output artifact, so a re-run
+# only re-parses and re-writes the moves whose source actually changed. When nothing
+# changed upstream, a re-run doesn't write anything.
+#
+# The manifest is a JSON file with one section per kind of thing being tracked:
+#   code      - hash of the extraction code (a change here invalidates all page hashes)
+#   pages     - move -> hash of the page downloaded for it
+#   records   - move_records/<move>.json and move_data/<move>.txt -> hash of what was written
+#   artifacts - output file -> hash of its contents
+#   sources   - move record file name -> hash of the record, as of the last artifact build
+
+import hashlib
+import json
+import os
+
+# Folder the scripts live in (all paths in the manifest are relative to it)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Where the manifest is stored
+manifest_path = os.path.join(script_dir, "build_manifest.json")
+
+
+# Returns the SHA-256 hex digest of a string or bytes
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+# Returns the hash of a file's contents, or None if the file doesn't exist
+def file_hash(path):
+    try:
+        with open(path, "rb") as file:
+            return content_hash(file.read())
+    except FileNotFoundError:
+        return None
+
+
+# Loads the manifest (an empty one if there is none yet)
+def load_manifest(path=manifest_path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+# Saves the manifest. It is written to a temporary file first and then moved into place,
+# so an interrupted run never leaves a half-written manifest behind
+def save_manifest(manifest, path=manifest_path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+# Name a file is tracked under in the manifest
+def manifest_key(path):
+    return os.path.relpath(os.path.abspath(path), script_dir)
+
+
+# Writes text (or bytes) to a file atomically, and only if the file doesn't already hold exactly that.
+# Returns True if the file was written. The hash is tracked in the given section of the manifest
+def write_if_changed(path, text, manifest, section="artifacts"):
+    artifacts = manifest.setdefault(section, {})
+    key = manifest_key(path)
+    new_hash = content_hash(text)
+
+    # Compare against what is really on disk, not just the manifest, so a file that was
+    # deleted or edited by hand is always rewritten
+    if artifacts.get(key) == new_hash and file_hash(path) == new_hash:
+        return False
+
+    # Written to a temporary file first and then moved into place, so a reader (or an
+    # interrupted build) never sees a half-written file
+    temp_path = path + ".tmp"
+    if isinstance(text, bytes):
+        with open(temp_path, "wb") as file:
+            file.write(text)
+    else:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+    os.replace(temp_path, path)
+    artifacts[key] = new_hash
+    return True
@@ -0,0 +1,73 @@
+# Compares the parser backends from extract_helper_funcs.py on every attackdex page in the
+# page archive. For each page it times how long each backend takes to parse the page and
+# pull out all four learnset sections, and checks that every backend produces exactly the
+# same move data as the original html.parser backend.
+#
+# Record the pages first (e.g. python extract_move.py --archive-mode record), then run:
+#   python compare_parsers.py [--archive page_archive.zip]
+
+import argparse
+import os
+import time
+
+# Only use the archive, never the network
+os.environ.setdefault("SEREBII_ARCHIVE_MODE", "replay")
+
+import page_archive
+from extract_helper_funcs import build_move_text, make_soup, parser_backends, extract_sections
+
+
+# Parses one page with the given backend and returns the move text and the time taken (ms)
+def time_backend(html, move, backend):
+    start = time.perf_counter()
+    text = build_move_text(move, extract_sections(make_soup(html, backend)))
+    return text, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare HTML parser backends on archived pages")
+    arg_parser.add_argument("--archive", default=page_archive.default_archive_path,
+                            help="path of the page archive file")
+    args = arg_parser.parse_args()
+
+    archive = page_archive.PageArchive(args.archive, "replay")
+
+    # Only the move pages are compared (their names are the archive keys)
+    keys = sorted(name for name in archive.names if "/attackdex-gs/" in name)
+
+    # Backends that can't be used on this machine (e.g. lxml not installed) are skipped
+    backends = []
+    for backend in parser_backends:
+        try:
+            make_soup("<p></p>", backend)
+            backends.append(backend)
+        except Exception as error:
+            print(f"Skipping backend {backend}: {error}")
+
+    totals = {backend: 0.0 for backend in backends}
+    mismatches = []
+
+    print("move".ljust(20) + "".join(f"{backend + ' (ms)':>20}" for backend in backends) + "  same")
+    for key in keys:
+        move = key.split("/")[-1].split(".")[0]
+        html = archive.get("https://" + key)
+
+        results = {backend: time_backend(html, move, backend) for backend in backends}
+        reference = results[backends[0]][0]
+        same = all(text == reference for text, _ in results.values())
+        if not same:
+            mismatches.append(move)
+
+        for backend in backends:
+            totals[backend] += results[backend][1]
+        print(move.ljust(20) + "".join(f"{results[backend][1]:>20.2f}" for backend in backends)
+              + ("  yes" if same else "  NO"))
+
+    print("total".ljust(20) + "".join(f"{totals[backend]:>20.2f}" for backend in backends))
+    if keys:
+        print("mean".ljust(20) + "".join(f"{totals[backend] / len(keys):>20.2f}" for backend in backends))
+
+    if mismatches:
+        print(f"\n{len(mismatches)} page(s) gave different results: {', '.join(mismatches)}")
+    else:
+        print(f"\nAll {len(keys)} pages gave the same results with every backend")
@@ -0,0 +1,25 @@
+# Turns the text files in move_data (written by older versions of extract_move.py) into the
+# JSON records in move_records that the JSON builders read, without crawling again.
+#   python convert_text_records.py
+
+import os
+
+from extract_helper_funcs import record_from_text
+
+# Folder with the text files, and folder the records are written to
+text_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "move_data")
+records_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "move_records")
+
+
+if __name__ == "__main__":
+    os.makedirs(records_folder, exist_ok=True)
+
+    for filename in sorted(os.listdir(text_folder)):
+        if filename.endswith(".txt"):
+            move = filename.replace(".txt", "")
+            with open(os.path.join(text_folder, filename), "r") as file:
+                move_name, record = record_from_text(file.read())
+            with open(os.path.join(records_folder, move + ".json"), "w") as file:
+                file.write(record.to_json(move, move_name))
+
+    print(f"Records written to {records_folder}")
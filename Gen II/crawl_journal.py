@@ -0,0 +1,153 @@
+# Journal that makes a crawl resumable. It records the status of every move as the crawl
+# goes (fetched, parsed, written or failed, with the error). Every change is appended to the
+# journal file as one JSON line, so recording a change costs the same however many moves
+# are done; the lines are folded together (the last line of a move wins) when the journal
+# is opened again, and it is then rewritten with one line per move. A line cut off by the
+# crawl dying half way through writing it is skipped, so the journal survives the crawl
+# dying at any point.
+#
+# While a crawl is running nothing is written to move_records/ or move_data/: each move's
+# files are written to a staging folder instead ("written" means staged). Only when every
+# move is written are the staged files promoted to their real place, so a crawl that dies
+# or has failures never leaves a mix of fresh and stale files behind. Running the crawl
+# again picks up the journal and only processes the moves that failed or weren't reached.
+#
+# The journal is thrown away (and the crawl starts over) if the extraction code, the parser
+# or the outputs asked for changed since it was started, since the staged files would no
+# longer be what this crawl writes.
+
+import json
+import os
+import shutil
+import threading
+import time
+
+from build_manifest import content_hash, file_hash, script_dir, write_if_changed
+
+# Where the journal and the staged files are kept
+journal_path = os.path.join(script_dir, "crawl_journal.jsonl")
+staging_dir = os.path.join(script_dir, "crawl_staging")
+
+# Statuses of a move, in the order a move goes through them
+statuses = ["fetched", "parsed", "written", "failed"]
+
+
+class CrawlJournal:
+    # settings: everything that decides what the crawl writes (see open())
+    def __init__(self, settings, moves=None, path=journal_path, staging=staging_dir):
+        self.settings = settings
+        # Move -> {"status", "page_hash", "stage", "error", "changed", "outputs", "updated"}
+        self.moves = moves or {}
+        self.path = path
+        self.staging = staging
+        self.lock = threading.Lock()
+
+    # Opens the journal of an unfinished crawl with the same settings, or starts a new one
+    # (throwing away a journal and staged files that don't match, or if fresh=True)
+    @classmethod
+    def open(cls, settings, fresh=False, path=journal_path, staging=staging_dir):
+        if not fresh and os.path.exists(path):
+            saved_settings, moves = cls.read(path)
+            if saved_settings == settings:
+                journal = cls(settings, moves, path, staging)
+                journal.save()
+                return journal
+        shutil.rmtree(staging, ignore_errors=True)
+        journal = cls(settings, None, path, staging)
+        journal.save()
+        return journal
+
+    # Reads a journal file: its settings (first line) and every move's latest entry
+    @staticmethod
+    def read(path):
+        settings, moves = None, {}
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    # Cut off when the crawl died
+                    continue
+                if "settings" in data:
+                    settings = data["settings"]
+                elif "move" in data:
+                    moves[data["move"]] = data["entry"]
+        return settings, moves
+
+    # Rewrites the journal with one line per move, through a temporary file that is moved
+    # into place, so it is never half written
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(json.dumps({"settings": self.settings}, sort_keys=True) + "\n")
+            for move, entry in self.moves.items():
+                file.write(json.dumps({"move": move, "entry": entry}, sort_keys=True) + "\n")
+        os.replace(temp_path, self.path)
+
+    # Records the new status of a move (and any other fields given) by appending its entry
+    # to the journal
+    def mark(self, move, status, **fields):
+        with self.lock:
+            entry = self.moves.setdefault(move, {})
+            entry.update(fields, status=status, updated=round(time.time(), 3))
+            if status != "failed":
+                entry.pop("error", None)
+                entry.pop("stage", None)
+            with open(self.path, "a") as file:
+                file.write(json.dumps({"move": move, "entry": entry}, sort_keys=True) + "\n")
+
+    def status(self, move):
+        entry = self.moves.get(move)
+        return entry["status"] if entry else None
+
+    # Moves of the dictionary that still have to be processed (failed or not reached yet)
+    def pending(self, all_moves):
+        return {move: move_name for move, move_name in all_moves.items() if self.status(move) != "written"}
+
+    # Moves that failed, with the stage and the error
+    def failures(self):
+        return {move: (entry.get("stage"), entry.get("error"))
+                for move, entry in self.moves.items() if entry["status"] == "failed"}
+
+    # Path a move's output file is staged at (output paths are kept absolute in the journal)
+    def staged_path(self, path):
+        return os.path.join(self.staging, os.path.relpath(path, script_dir).replace("..", "__"))
+
+    # Writes a move's output files (path -> contents) to the staging folder and marks the
+    # move as written. Returns True if any of them differs from the file it will replace
+    def stage(self, move, outputs, page_hash):
+        outputs = {os.path.abspath(path): contents for path, contents in outputs.items()}
+        changed = False
+        for path, contents in outputs.items():
+            staged = self.staged_path(path)
+            os.makedirs(os.path.dirname(staged), exist_ok=True)
+            temp_path = staged + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(contents)
+            os.replace(temp_path, staged)
+            changed = changed or file_hash(path) != content_hash(contents)
+        self.mark(move, "written", page_hash=page_hash, changed=changed, outputs=list(outputs))
+        return changed
+
+    # Moves every staged file to its real place (through write_if_changed, so unchanged
+    # files aren't touched and the manifest is kept up to date), records the page hashes in
+    # pages (move -> hash) and removes the journal and the staging folder. all_moves maps
+    # each move to the name its page is tracked under. Returns the number of files changed
+    def promote(self, all_moves, manifest, pages):
+        changed = 0
+        for move, entry in self.moves.items():
+            for path in entry.get("outputs", []):
+                with open(self.staged_path(path), "r", encoding="utf-8") as file:
+                    contents = file.read()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                changed += write_if_changed(path, contents, manifest, "records")
+            if move in all_moves and entry.get("page_hash"):
+                pages[all_moves[move]] = entry["page_hash"]
+        self.discard()
+        return changed
+
+    # Removes the journal and the staging folder
+    def discard(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
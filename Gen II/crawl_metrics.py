@@ -0,0 +1,194 @@
+# Instrumentation for the crawler. Every stage of every move (fetch, parse, write) is
+# timed, and the crawl keeps count of bytes downloaded, retries, rows found in each
+# learnset section and failures. There are three ways to look at what happened:
+#   - a stream of JSON-lines events, one per stage per move (--events FILE, "-" = stderr)
+#   - a summary in the Prometheus text format written at the end of the crawl (--metrics FILE),
+#     with a latency histogram per stage
+#   - an optional profile of the parse stage only (--profile-parse cprofile|tracemalloc)
+# All of this is off unless asked for, so a normal crawl pays nothing for it.
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# Upper bounds (seconds) of the latency histogram buckets
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Learnset sections counted in the rows metric (keys of a move record)
+record_sections = ["levelup", "TM", "breeding", "event"]
+
+
+# Latency histogram with fixed buckets (Prometheus style: each bucket counts the
+# observations at or below its bound)
+class Histogram:
+    def __init__(self, buckets=latency_buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class CrawlMetrics:
+    # events_stream is a text stream that gets one JSON line per event (None = no events)
+    def __init__(self, events_stream=None):
+        self.events_stream = events_stream
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stage_seconds = {}
+        self.bytes_total = 0
+        self.pages_total = 0
+        self.retries_total = 0
+        self.rows_total = {section: 0 for section in record_sections}
+        self.failures_total = {}
+
+    # Writes one event as a JSON line
+    def event(self, kind, **fields):
+        if self.events_stream is None:
+            return
+        line = json.dumps({"time": round(time.time(), 6), "event": kind, **fields})
+        with self.lock:
+            self.events_stream.write(line + "\n")
+            self.events_stream.flush()
+
+    # Records how long one stage took for one move
+    def observe_stage(self, stage, move, seconds, **fields):
+        with self.lock:
+            self.stage_seconds.setdefault(stage, Histogram()).observe(seconds)
+        self.event(stage, move=move, seconds=round(seconds, 6), **fields)
+
+    # Records a downloaded page
+    def observe_fetch(self, move, seconds, size, retries=0):
+        with self.lock:
+            self.pages_total += 1
+            self.bytes_total += size
+            self.retries_total += retries
+        self.observe_stage("fetch", move, seconds, bytes=size, retries=retries)
+
+    # Records a parsed page and how many rows each section of its record has
+    def observe_parse(self, move, seconds, record_json):
+        record = json.loads(record_json)
+        rows = {section: len(record.get(section) or []) for section in record_sections}
+        with self.lock:
+            for section, count in rows.items():
+                self.rows_total[section] += count
+        self.observe_stage("parse", move, seconds, rows=rows)
+
+    # Records one retry of a request as it happens (called by the fetch layer). The retries
+    # are added to the total once the page is in (observe_fetch) or has failed (count_failure)
+    def count_retry(self, move=None, reason=None):
+        self.event("retry", move=move, reason=reason)
+
+    # Records a move that failed in the given stage, with the retries of a failed download
+    # (fetch_layer.FetchError.retries)
+    def count_failure(self, stage, move, error):
+        with self.lock:
+            self.failures_total[stage] = self.failures_total.get(stage, 0) + 1
+            self.retries_total += getattr(error, "retries", 0)
+        self.event("failure", stage=stage, move=move, error=str(error))
+
+    # Summary of everything recorded, in the Prometheus text exposition format
+    def prometheus_text(self):
+        lines = [
+            "# HELP learnset_crawl_stage_seconds Time spent in each crawl stage per move.",
+            "# TYPE learnset_crawl_stage_seconds histogram",
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.stage_seconds.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'learnset_crawl_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'learnset_crawl_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'learnset_crawl_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'learnset_crawl_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += ["# HELP learnset_crawl_pages_total Pages downloaded.",
+                      "# TYPE learnset_crawl_pages_total counter",
+                      f"learnset_crawl_pages_total {self.pages_total}",
+                      "# HELP learnset_crawl_response_bytes_total Bytes of page text downloaded.",
+                      "# TYPE learnset_crawl_response_bytes_total counter",
+                      f"learnset_crawl_response_bytes_total {self.bytes_total}",
+                      "# HELP learnset_crawl_retries_total Requests that had to be retried.",
+                      "# TYPE learnset_crawl_retries_total counter",
+                      f"learnset_crawl_retries_total {self.retries_total}",
+                      "# HELP learnset_crawl_rows_total Rows extracted per learnset section.",
+                      "# TYPE learnset_crawl_rows_total counter"]
+            lines += [f'learnset_crawl_rows_total{{section="{section}"}} {count}'
+                      for section, count in self.rows_total.items()]
+            lines += ["# HELP learnset_crawl_failures_total Moves that failed, per stage.",
+                      "# TYPE learnset_crawl_failures_total counter"]
+            lines += [f'learnset_crawl_failures_total{{stage="{stage}"}} {count}'
+                      for stage, count in sorted(self.failures_total.items())]
+            lines += ["# HELP learnset_crawl_duration_seconds Wall time of the crawl.",
+                      "# TYPE learnset_crawl_duration_seconds gauge",
+                      f"learnset_crawl_duration_seconds {time.time() - self.started:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    # Writes the Prometheus summary to a file ("-" = standard output)
+    def write_summary(self, path):
+        text = self.prometheus_text()
+        if path == "-":
+            sys.stdout.write(text)
+        else:
+            with open(path, "w") as file:
+                file.write(text)
+
+
+# Profiles only the code run inside parse() calls, with cProfile (where the time goes) or
+# tracemalloc (where the memory is allocated). Parses are serialized while profiling so
+# two parses don't end up in one profile (tracemalloc still sees allocations made by fetch
+# threads during a parse, so use --workers 1 for exact memory numbers)
+class ParseProfiler:
+    modes = ["cprofile", "tracemalloc"]
+
+    def __init__(self, mode):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown profiler '{mode}', expected one of {self.modes}")
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.parses = 0
+        self.peak_bytes = 0
+        self.snapshot = None
+
+    # Runs fn(*args) under the profiler and returns its result
+    def run(self, fn, *args):
+        with self.lock:
+            self.parses += 1
+            if self.mode == "cprofile":
+                return self.profile.runcall(fn, *args)
+
+            tracemalloc.start()
+            try:
+                return fn(*args)
+            finally:
+                peak = tracemalloc.get_traced_memory()[1]
+                # Keep the allocations of the parse that used the most memory
+                if peak >= self.peak_bytes:
+                    self.peak_bytes = peak
+                    self.snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+
+    # Text report: the 30 most expensive functions, or the lines that allocated the most
+    def report(self):
+        out = io.StringIO()
+        if not self.parses:
+            out.write("No pages were parsed\n")
+        elif self.mode == "cprofile":
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(30)
+        else:
+            out.write(f"Peak traced memory of one parse: {self.peak_bytes / 1e6:.2f} MB\n")
+            if self.snapshot is not None:
+                for stat in self.snapshot.statistics("lineno")[:30]:
+                    out.write(f"{stat}\n")
+        return out.getvalue()
@@ -0,0 +1,156 @@
+# Crawls the move pages of several generations at once (see generations.py). All
+# generations share one HTTP session (one keep-alive connection pool), one page archive and
+# one set of worker threads, and every request to serebii goes through the shared fetch
+# layer (fetch_layer.py), so its rate limit and concurrency cap cover all the generations
+# together: crawling five generations never hits the site harder than crawling one. The
+# moves of the generations are interleaved, so the workers stay busy until the last page
+# of the largest generation instead of each generation waiting for the one before it.
+#
+# Progress is kept in the crawl journal (crawl_journal.py) like a single generation crawl,
+# with each move tracked as "generation/move": a crawl that stopped part way only fetches
+# the moves it hadn't finished, and nothing is written to the output folders until every
+# move of every generation is done.
+#   python crawl_scheduler.py [--generation gen2 ...] [--workers 8] [--rate 10] [--fresh]
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import fetch_layer
+import page_archive
+from build_manifest import load_manifest, save_manifest
+from crawl_journal import CrawlJournal
+from extract_helper_funcs import parser_backends
+from extract_move import default_workers, extraction_code_hash, make_session, process_move
+from generations import profiles
+
+
+# Journal of one generation inside the crawl's journal: the moves are recorded as
+# "generation/move", so the same move in two generations is tracked separately
+class GenerationJournal:
+    def __init__(self, journal, profile):
+        self.journal = journal
+        self.profile = profile
+
+    def key(self, move):
+        return f"{self.profile.name}/{move}"
+
+    def mark(self, move, status, **fields):
+        self.journal.mark(self.key(move), status, **fields)
+
+    def stage(self, move, outputs, page_hash):
+        return self.journal.stage(self.key(move), outputs, page_hash)
+
+
+# Jobs of every generation, taking one move from each generation in turn:
+# (profile, move, move name)
+def interleave_jobs(generation_profiles):
+    move_lists = [[(profile, move, move_name) for move, move_name in profile.load_moves().items()]
+                  for profile in generation_profiles]
+    return [job for jobs in itertools.zip_longest(*move_lists) for job in jobs if job is not None]
+
+
+# Crawls every move of the given generations (profiles from generations.py) with one shared
+# session and worker pool. With incremental=True, pages that haven't changed since the last
+# build are not parsed again. Progress is kept in the crawl journal, so a crawl that stopped
+# part way only processes the moves it hadn't finished (fresh=True starts over). Returns the
+# names of the moves that failed, as "generation/move"
+def crawl_generations(generation_profiles, workers=default_workers, parser=parser_backends[0],
+                      incremental=False, with_text=False, fresh=False):
+    for profile in generation_profiles:
+        os.makedirs(profile.records_folder, exist_ok=True)
+        if with_text:
+            os.makedirs(profile.text_folder, exist_ok=True)
+
+    session = make_session(max(workers, 1))
+
+    # Page hashes from the last build are only trusted if the extraction code is the same
+    manifest = load_manifest()
+    code_hash = extraction_code_hash(parser)
+    known_pages = manifest.get("pages", {}) if incremental and manifest.get("code") == code_hash else {}
+
+    journal = CrawlJournal.open({"code": code_hash, "with_text": with_text,
+                                 "generations": sorted(profile.name for profile in generation_profiles)}, fresh)
+    views = {profile.name: GenerationJournal(journal, profile) for profile in generation_profiles}
+    jobs = interleave_jobs(generation_profiles)
+    all_keys = {views[profile.name].key(move): (profile, move_name) for profile, move, move_name in jobs}
+    pending = journal.pending(all_keys)
+    if len(pending) < len(all_keys):
+        print(f"Resuming the last crawl: {len(all_keys) - len(pending)} of {len(all_keys)} moves are already done")
+    jobs = [job for job in jobs if views[job[0].name].key(job[1]) in pending]
+
+    counts = {profile.name: 0 for profile in generation_profiles}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(process_move, session, move, move_name, manifest, parser,
+                               known_pages.get(profile.page_key(move_name)), with_text, profile,
+                               journal=views[profile.name]):
+                   (profile, move_name) for profile, move, move_name in jobs}
+        for future in as_completed(futures):
+            profile, move_name = futures[future]
+            try:
+                _, _, changed = future.result()
+            except Exception as error:
+                print(f"Failed processing data for: {profile.name} {move_name} - {error}")
+                continue
+            counts[profile.name] += 1
+            print(f"{'Finished processing data for' if changed else 'Unchanged'}: {profile.name} {move_name}")
+
+    wall_seconds = time.perf_counter() - start
+    print(f"\nCrawled {len(jobs)} pages from {len(generation_profiles)} generation(s) in {wall_seconds:.2f}s "
+          f"({workers} workers)")
+    for name, count in counts.items():
+        print(f"{name:<6} {count:>5} moves")
+
+    # Nothing is written until every move of every generation is done (see crawl_journal.py)
+    failed = list(journal.pending(all_keys))
+    if failed:
+        print(f"{len(failed)} move(s) failed: {', '.join(failed)}")
+        print("Nothing was written to the output folders. Run the crawl again to retry only these moves")
+        return failed
+    page_keys = {key: profile.page_key(move_name) for key, (profile, move_name) in all_keys.items()}
+    changed = journal.promote(page_keys, manifest, manifest.setdefault("pages", {}))
+    manifest["code"] = code_hash
+    save_manifest(manifest)
+    print(f"All {len(all_keys)} moves done, {changed} file(s) updated")
+    return failed
+
+
+# Runs the crawl with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Crawl the move pages of several generations at once")
+    arg_parser.add_argument("--generation", action="append", choices=profiles, dest="generations",
+                            help="generation to crawl (can be given more than once, default: all)")
+    arg_parser.add_argument("--workers", type=int, default=default_workers,
+                            help="number of pages fetched at the same time, shared by all generations")
+    arg_parser.add_argument("--rate", type=float, default=10.0,
+                            help="most requests per second to serebii for all generations together "
+                                 "(halved whenever it throttles us)")
+    arg_parser.add_argument("--max-retries", type=int, default=5,
+                            help="times a throttled, failed or invalid page download is retried")
+    arg_parser.add_argument("--parser", choices=parser_backends, default=parser_backends[0],
+                            help="HTML parser backend (see extract_helper_funcs.py)")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="only parse and write moves whose page changed since the last build")
+    arg_parser.add_argument("--write-text", action="store_true",
+                            help="also write the human readable text view of each move")
+    arg_parser.add_argument("--fresh", action="store_true",
+                            help="ignore the journal of an unfinished crawl and start over")
+    arg_parser.add_argument("--archive-mode", choices=page_archive.archive_modes,
+                            help="off, record (cache pages in the archive) or replay (archive only, no network)")
+    arg_parser.add_argument("--archive", help="path of the page archive file")
+    args = arg_parser.parse_args(argv)
+
+    page_archive.configure(args.archive_mode, args.archive)
+    fetch_layer.configure(rate=args.rate, concurrency=max(args.workers, 1), max_retries=args.max_retries)
+
+    generation_profiles = [profiles[name] for name in args.generations or profiles]
+    crawl_generations(generation_profiles, args.workers, args.parser, args.incremental, args.write_text,
+                      args.fresh)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,47 @@
 import requests # type: ignore
-from bs4 import BeautifulSoup # type: ignore
+from bs4 import BeautifulSoup, NavigableString # type: ignore
+from bs4.builder import builder_registry # type: ignore
+from dataclasses import asdict, dataclass
+import json
+import time
+from typing import Optional
 import re
 
+from species_table import type_names
+
 # Helper functions that process each possible way a Pokemon can learn a move (via:
 # Level Up, TM/HM, Breeding/Egg Moves, and Special Events)
 
+# Parser backends that can be used to turn a page into a soup for the helpers below:
+#   html.parser - Python's built-in parser over the whole page (the original behavior)
+#   lxml        - the lxml C parser over the whole page (needs lxml installed)
+#   sections    - only parses the page from the first "level"/"TM"/"egg" anchor onwards,
+#                 skipping the header, navigation and the three move dropdown lists, and
+#                 uses lxml when it is installed. Everything the helpers look at (the
+#                 anchors, the text right after them and the dextable tables) comes after
+#                 the first anchor, so the helpers give the same results
+parser_backends = ["html.parser", "lxml", "sections"]
+
+# Matches the opening tag of the first anchor that starts a learnset section
+section_anchor_pattern = re.compile(r'<a\s[^>]*name\s*=\s*["\']?(?:level|TM|egg)\b', re.IGNORECASE)
+
+
+# Parses the HTML of a page with the chosen backend and returns the soup
+def make_soup(html, backend="html.parser"):
+    if backend == "html.parser" or backend == "lxml":
+        return BeautifulSoup(html, backend)
+
+    if backend == "sections":
+        # Cut off everything before the first section anchor. If the page has no section
+        # anchors at all the helpers will find nothing either, so an empty soup is enough
+        match = section_anchor_pattern.search(html)
+        html = html[match.start():] if match else ""
+        # Use lxml for the remaining part when it is available
+        features = "lxml" if builder_registry.lookup("lxml") else "html.parser"
+        return BeautifulSoup(html, features)
+
+    raise ValueError(f"Unknown parser backend '{backend}', expected one of {parser_backends}")
+
 # TODO
 # Write helper function for TM data extraction (equivalent to "if TM_anchors" in main file)
 def get_TM_anchors(TM_anchors):
@@ -45,27 +82,63 @@ def get_TM_anchors(TM_anchors):
         return event_section, TM_section
 
 
-# Pulls the data about which Pokemon can learn the move via Level Up and returns a 
-# list of the names of those Pokemon
-def get_byleveup(levelup_section):
-    # Find the table right after the "level" anchor
-    table = levelup_section.find_next("table", class_="dextable")
-
+# Finds a type name in an image's alt text or file name
+type_pattern = re.compile(r"\b(" + "|".join(type_names) + r")\b", re.IGNORECASE)
+
+
+# Pulls the species columns out of one dextable row: the national dex number (1st column),
+# the name (3rd), the types (the type images in the 4th) and the base stats (5th to 10th).
+# Returns None if the row doesn't have them all
+def parse_species_row(cols):
+    if len(cols) < 10:
+        return None
+    dex = re.search(r'\d+', cols[0].get_text())
+    try:
+        stats = [int(col.get_text(strip=True)) for col in cols[4:10]]
+    except ValueError:
+        return None
+    if dex is None:
+        return None
+
+    # Each type is an image. Its type is the Gen II type named in its alt text or, failing
+    # that, in its file name ("Water", "Water-type", ".../type/water.gif" -> "Water"), so
+    # the exact wording of either doesn't matter. Images naming no type are skipped
+    types = []
+    for image in cols[3].find_all("img"):
+        for text in [image.get("alt") or "", (image.get("src") or "").rsplit("/", 1)[-1]]:
+            found = type_pattern.search(text)
+            if found:
+                types.append(found.group(1).capitalize())
+                break
+
+    return SpeciesRow(int(dex.group()), cols[2].get_text(strip=True), types, stats)
+
+
+# Pulls the data about which Pokemon can learn the move via Level Up out of the level up
+# table and returns a list of LevelUpEntry (the Pokemon and the levels they learn it at).
+# If a species dictionary is given, the species columns of every row are added to it
+# (name -> SpeciesRow)
+def parse_levelup_table(table, species=None):
     # Pull the data from each row in the table except the first two. The first row
     # contains header info such as Pokedex #, Pokemon Name, Base Stats, level the 
     # Pokemon learns the move at, etc. while the second row contains subheadings 
     # for the Base Stats (HP, Attack, etc.) and for the level the Pokemon learns 
     # the move at (Gold/Silver vs. Crystal) 
     levelup_rows = table.find_all("tr")[2:] 
-  
+
+    # Get the data for each column in each row
+    return parse_levelup_rows([row.find_all("td", class_="fooinfo") for row in levelup_rows], species)
+
+
+# Same as parse_levelup_table, for rows that were already split into their "fooinfo"
+# columns (anything with get_text and find_all like a BeautifulSoup tag, so the streaming
+# extractor in stream_extract.py can use it too)
+def parse_levelup_rows(rows, species=None):
     # Container to store the results
     levelup_data = []
 
     # Examine each individual row from the list of rows
-    for row in levelup_rows:
-        # print("The current row in LEVEUP is:\n", row, "\n")
-        # Get the data for each column in the current row
-        cols = row.find_all("td", class_="fooinfo")
+    for cols in rows:
         # Make sure there are enough columns so that the correct data is extacted
         if len(cols) > 11:
             # Need to extract the 3rd column for the Pokemon's name and also the 11th 
@@ -77,99 +150,325 @@ def get_byleveup(levelup_section):
             # Level move is learned at in Crystal
             level_C = cols[11].get_text(strip=True)
 
-            # If multiple levels are listed, split them and reformat (correct split location found
-            # using a regular expression)
-            level_GS_formatted = ", ".join(re.findall(r'Lv\.\s?\d+', level_GS))
-            # level_C_formatted = ", ".join([f"{level}" for level in level_C.split(", ")])
-            level_C_formatted = ", ".join(re.findall(r'Lv\.\s?\d+', level_C))
-
-            # Format the final data result for the current Pokemon
-            formatted_entry = f"{pokemon_name}: {level_GS_formatted} | {level_C_formatted}"
+            # If multiple levels are listed, pull out each one as a number (correct split
+            # location found using a regular expression)
+            levels_GS = [int(level) for level in re.findall(r'Lv\.\s?(\d+)', level_GS)]
+            levels_C = [int(level) for level in re.findall(r'Lv\.\s?(\d+)', level_C)]
 
             # Add the relevant info to the results array
-            levelup_data.append(formatted_entry)
+            levelup_data.append(LevelUpEntry(pokemon_name, levels_GS, levels_C))
+            if species is not None and pokemon_name not in species:
+                row = parse_species_row(cols)
+                if row:
+                    species[pokemon_name] = row
 
     # Return the data that was extracted
     return levelup_data
 
-# Pulls the data about which Pokemon can learn the move via TM/HM and returns a 
-# list of the names of those Pokemon (this works for HMs as well as TMs due to the)
-# way the anchor tags are labeled in the HTML
-def get_byTM(TM_section):
+# Pulls the names of the Pokemon out of a TM/HM, breeding or special event table. These
+# tables all have the same layout (the name is the 3rd column of each data row). If a
+# species dictionary is given, the species columns of every row are added to it
+def parse_name_table(table, species=None):
     # Pull the data from each row in the table (skip the first two header rows)
-    TM_rows = TM_section.find_all("tr")[2:]
+    rows = table.find_all("tr")[2:]
+
+    # Get the data for each column in each row
+    return parse_name_rows([row.find_all("td", class_="fooinfo") for row in rows], species)
+
 
+# Same as parse_name_table, for rows that were already split into their "fooinfo" columns
+def parse_name_rows(rows, species=None):
     # Container to store results
-    TM_data = []
+    names = []
 
     # Examine each individual row from the list of rows
-    for row in TM_rows:
-        # Get the data for each column in the current row
-        cols = row.find_all("td", class_="fooinfo")
-
+    for cols in rows:
         # Skips rows that contain undeeded data (only need Mon names)
         if len(cols) > 9:
             # Extract the 3rd column containing the Pokemon's name
             pokemon_name = cols[2].get_text(strip=True)
 
-            # print("The current Pokemon is: ", pokemon_name)
-
             # Add the name to the results array
-            TM_data.append(pokemon_name)
+            names.append(pokemon_name)
+            if species is not None and pokemon_name not in species:
+                row = parse_species_row(cols)
+                if row:
+                    species[pokemon_name] = row
     
     # Return the extracted data
-    return TM_data
+    return names
+
+# Pulls the data about which Pokemon can learn the move via Level Up and returns a 
+# list of the names of those Pokemon ("Name: Lv. X | Lv. Y")
+def get_byleveup(levelup_section):
+    # Find the table right after the "level" anchor
+    table = levelup_section.find_next("table", class_="dextable")
+    return [format_levelup_entry(entry) for entry in parse_levelup_table(table)]
+
+# Pulls the data about which Pokemon can learn the move via TM/HM and returns a 
+# list of the names of those Pokemon (this works for HMs as well as TMs due to the)
+# way the anchor tags are labeled in the HTML
+def get_byTM(TM_section):
+    return parse_name_table(TM_section)
 
 # Pulls the data about which Pokemon can learn the move through Breeding (Egg Moves)
 def get_bybreeding(eggmove_section):
     # Find the table right after the "egg" anchor
-    table = eggmove_section.find_next("table", class_="dextable")
-
-     # Pull the data from each row in the table (skip the first two header rows)
-    eggmove_rows = table.find_all("tr")[2:]
-
-    # Container to store results
-    eggmove_data = []
-
-    # Examine each row from the list of rows
-    for row in eggmove_rows:
-        # Get the data for each column in the current row
-        cols = row.find_all("td", class_="fooinfo")
-        
-        # Skip rows that don't contain valid data (e.g., rows with Pokémon names)
-        if len(cols) > 9:  
-            # Extract the 3rd column for the Pokémon's name
-            pokemon_name = cols[2].get_text(strip=True)
-
-            # Print the current Pokémon name (optional, for debugging purposes)
-            # print("The current Pokemon is: ", pokemon_name)
-
-            # Add the Pokémon name to the results array
-            eggmove_data.append(pokemon_name)    
-  
-    # Return the extracted data
-    return eggmove_data
+    return parse_name_table(eggmove_section.find_next("table", class_="dextable"))
 
 # Pulls the data about which Pokemon can learn the move through a Special Event
 def get_byspecialevent(event_section):
-    # Pull the data from each row in the table (skip first two header rows)
-    event_rows = event_section.find_all("tr")[2:]
-
-    # Container to store results
-    event_data = []
-
-    # Examine each individual row from the list of rows
-    for row in event_rows:
-        # Get the data for each column in the current row
-        cols = row.find_all("td", class_="fooinfo")
-
-         # Skips rows that contain undeeded data (only need Mon names)
-        if len(cols) > 9:
-            # Extract the 3rd column containing the Pokemon's name
-            pokemon_name = cols[2].get_text(strip=True)
-
-            # Add the name to the results array
-            event_data.append(pokemon_name)
-
-    # Return the extracted data
-    return event_data
+    return parse_name_table(event_section)
+
+
+# One row of the level up table: the Pokemon and the levels it learns the move at in
+# Gold/Silver and in Crystal (either list can be empty, or hold more than one level)
+@dataclass
+class LevelUpEntry:
+    pokemon: str
+    levels_GS: list
+    levels_C: list
+
+
+# Formats a level up entry the way it is written in the text files ("Name: Lv. X | Lv. Y")
+def format_levelup_entry(entry):
+    level_GS_formatted = ", ".join(f"Lv. {level}" for level in entry.levels_GS)
+    level_C_formatted = ", ".join(f"Lv. {level}" for level in entry.levels_C)
+    return f"{entry.pokemon}: {level_GS_formatted} | {level_C_formatted}"
+
+
+# The species columns of a dextable row: national dex number, name, types and base stats
+# (in the order of stat_names)
+@dataclass
+class SpeciesRow:
+    dex: int
+    pokemon: str
+    types: list
+    stats: list
+
+
+# Everything pulled from a single move page. A section is None when its anchor was not
+# found on the page (this is different from an empty list, which means the table was
+# there but had no Pokemon in it)
+@dataclass
+class MoveRecord:
+    # LevelUpEntry for each Pokemon that learns the move by level up
+    levelup: Optional[list] = None
+    # Names of Pokemon that learn the move by TM/HM
+    TM: Optional[list] = None
+    # Names of Pokemon that learn the move by breeding
+    breeding: Optional[list] = None
+    # Names of Pokemon that learn the move through a special event
+    event: Optional[list] = None
+    # SpeciesRow of every Pokemon in the tables above, once each (None for records written
+    # before the crawler kept these columns)
+    species: Optional[list] = None
+
+    # Turns the record into one line of JSON, tagged with the move it belongs to (its URL
+    # name and its display name), as stored in move_records/<move>.json
+    def to_json(self, move, move_name):
+        data = {"move": move, "name": move_name}
+        data.update(asdict(self))
+        return json.dumps(data) + "\n"
+
+    # Reads a record back from its JSON. Returns the move, its display name and the record
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        levelup = data["levelup"]
+        if levelup is not None:
+            levelup = [LevelUpEntry(**entry) for entry in levelup]
+        species = data.get("species")
+        if species is not None:
+            species = [SpeciesRow(**row) for row in species]
+        record = cls(levelup, data["TM"], data["breeding"], data["event"], species)
+        return data["move"], data["name"], record
+
+    # Names of every Pokemon that can learn the move in any way, in the order they appear
+    # (level up, TM/HM, breeding, special event) and without duplicates
+    def learners(self):
+        names = [entry.pokemon for entry in self.levelup or []]
+        names += (self.TM or []) + (self.breeding or []) + (self.event or [])
+        return list(dict.fromkeys(names))
+
+
+# Tells whether the text right after a "TM" anchor belongs to the event table, the TM
+# table, or neither (same checks as get_TM_anchors)
+def classify_TM_anchor(text_after_anchor):
+    if "Event or a special way" in text_after_anchor:
+        return "event"
+    elif "TM" in text_after_anchor:
+        return "TM"
+    return None
+
+
+# Pulls every learnset section out of a page in a single walk over the document. The
+# result is the same as calling get_TM_anchors and the get_by* helpers above, but instead
+# of searching the whole page again for each anchor and each table, the elements are
+# visited once in document order: an anchor is remembered until the next dextable shows
+# up, and that table's rows are read as soon as it is reached
+def extract_sections(soup):
+    record = MoveRecord()
+    # Species columns of every row read, by name
+    species = {}
+
+    # Sections whose anchor has been seen but whose table hasn't been reached yet
+    pending_sections = []
+    # "TM" anchors still waiting for the text right after them (which tells us if they
+    # belong to the TM table or the event table)
+    unlabeled_anchors = 0
+    # Only the first "level" and "egg" anchors count (like soup.find)
+    seen_level = False
+    seen_egg = False
+
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            # The first string after a "TM" anchor labels every anchor still waiting for it
+            if unlabeled_anchors:
+                label = classify_TM_anchor(node.strip())
+                if label:
+                    pending_sections.extend([label] * unlabeled_anchors)
+                unlabeled_anchors = 0
+
+        elif node.name == "a":
+            anchor_name = node.get("name")
+            if anchor_name == "level" and not seen_level:
+                seen_level = True
+                pending_sections.append("levelup")
+            elif anchor_name == "egg" and not seen_egg:
+                seen_egg = True
+                pending_sections.append("breeding")
+            elif anchor_name == "TM":
+                unlabeled_anchors += 1
+
+        elif node.name == "table" and "dextable" in (node.get("class") or []):
+            # The table's first string is the text after an anchor that comes right
+            # before it, so label those anchors before handing out the table
+            if unlabeled_anchors:
+                label = classify_TM_anchor((node.find(string=True) or "").strip())
+                if label:
+                    pending_sections.extend([label] * unlabeled_anchors)
+                unlabeled_anchors = 0
+
+            # Read the table once for each distinct section waiting for it. A later
+            # TM/event table replaces an earlier one, as in get_TM_anchors
+            for section in dict.fromkeys(pending_sections):
+                if section == "levelup":
+                    record.levelup = parse_levelup_table(node, species)
+                else:
+                    setattr(record, section, parse_name_table(node, species))
+            pending_sections = []
+
+    # Anchors that never got a table after them still mark the section as present
+    for section in pending_sections:
+        if getattr(record, section) is None:
+            setattr(record, section, [])
+
+    record.species = list(species.values())
+    return record
+
+
+# Builds the full text file contents for a single move from the sections pulled out of
+# its page. The output is exactly what the original loop produced by appending to the
+# file section by section
+def build_move_text(move_name, record):
+    # Prepare the text with informaiton about the current move
+    text = "Pokémon that can learn the move " + move_name
+
+    # First to be processed is learning the move through level up
+    text += "\n\nVia Level Up:\n"
+    # Check to make sure the level up section was found before accessing it
+    if record.levelup is not None:
+        text += "\n".join(format_levelup_entry(entry) for entry in record.levelup)
+    # If there is no level up section, this means no Pokemon can learn the move
+    # via level up. In this case, write "NONE" to that portion of the file
+    else:
+        text += "NONE"
+
+    # Second to be processed is learning the move through TM/HM
+    if record.TM is not None:
+        # If there was TM data found, write it to the file
+        if record.TM:
+            text += "\n\nVia TM:\n"
+            text += "\n".join(record.TM)
+    # If there was no data found, write NONE to the file to indicate it
+    else:
+        text += "\n\nVia TM:\n"
+        text += "NONE"
+
+    # Third to be processed is learning the move through breeding
+    text += "\n\nVia Breeding:\n"
+    # Check and make sure the breeding section was found before accessing it
+    if record.breeding is not None:
+        if record.breeding:
+            text += "\n".join(record.breeding)
+        else:
+            text += "NONE"
+    # If there is no breeding section, the breeding table could not be found
+    else:
+        text += "ERROR WITH DATA"
+
+    # Last to be processed is Pokemon that can learn the move through a Special Event
+    if record.event is not None:
+        # Make sure the event data contains info to access
+        if record.event:
+            text += "\n\nVia Special Event:\n"
+            text += "\n".join(record.event)
+    # Handle case where no Pokemon can learn move through a Special Event
+    else:
+        text += "\n\nVia Special Event:\n"
+        text += "NONE"
+
+    return text
+
+
+# Reads a move text file (as written by build_move_text) back into its display name and
+# a MoveRecord. This is the exact inverse of build_move_text, including the NONE/ERROR WITH
+# DATA markers and the sections that are left out, so text files written before the crawler
+# produced records can be turned into records without crawling again
+def record_from_text(text):
+    header, *blocks = text.split("\n\nVia ")
+    move_name = header.replace("Pokémon that can learn the move ", "", 1)
+
+    # Lines under each section heading ("Level Up", "TM", "Breeding", "Special Event")
+    sections = {}
+    for block in blocks:
+        heading, _, body = block.partition(":\n")
+        sections[heading] = body.split("\n") if body else []
+
+    record = MoveRecord()
+
+    # Level up: NONE means the section wasn't on the page
+    lines = sections.get("Level Up", ["NONE"])
+    if lines != ["NONE"]:
+        record.levelup = []
+        for line in lines:
+            pokemon, _, levels = line.partition(": ")
+            level_GS, _, level_C = levels.partition("|")
+            record.levelup.append(LevelUpEntry(pokemon,
+                                               [int(level) for level in re.findall(r'\d+', level_GS)],
+                                               [int(level) for level in re.findall(r'\d+', level_C)]))
+
+    # TM/HM and special event: NONE means the section wasn't on the page, a missing
+    # heading means the table was there but empty
+    for heading, field in [("TM", "TM"), ("Special Event", "event")]:
+        lines = sections.get(heading, [])
+        setattr(record, field, None if lines == ["NONE"] else lines)
+
+    # Breeding: ERROR WITH DATA means the section wasn't on the page, NONE means empty
+    lines = sections.get("Breeding", ["ERROR WITH DATA"])
+    record.breeding = None if lines == ["ERROR WITH DATA"] else [] if lines == ["NONE"] else lines
+
+    return move_name, record
+
+
+# Parses one page and returns the JSON record for the move, its text file contents (only
+# when with_text is True, otherwise None) and the time the parsing took (in seconds). This
+# is what the parse stage of the crawl pipeline runs in its worker processes, so it only
+# depends on the functions in this file
+def parse_page(move, move_name, html, parser="html.parser", with_text=False):
+    start = time.perf_counter()
+    record = extract_sections(make_soup(html, parser))
+    record_json = record.to_json(move, move_name)
+    text = build_move_text(move_name, record) if with_text else None
+    return record_json, text, time.perf_counter() - start
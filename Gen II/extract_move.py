@@ -1,151 +1,545 @@
 import requests # type: ignore
-from bs4 import BeautifulSoup # type: ignore
+from requests.adapters import HTTPAdapter # type: ignore
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import argparse
 import os
-import re
+import queue
+import sys
+import threading
+import time
 
 # Import helper functions
-from extract_helper_funcs import *
+from extract_helper_funcs import parser_backends
 
-# Import function that will get the list of all moves from Gen II
+# Import function that will get the list of all moves from Gen II, and the local copy of it
 from get_gen2_movelist import get_moves
+from move_registry import save_move_names
 
-# Dictionary containing all moves from the Gen II Pokemon Games
-all_moves = {}
+# Record/replay store for the downloaded pages, and the rate limited download layer
+import fetch_layer
+import page_archive
+
+# Where the pages and outputs of each generation are (only Gen II so far)
+from generations import gen2, profiles
+
+# Optional per-stage timings, events and profiling
+from crawl_metrics import CrawlMetrics, ParseProfiler
+
+# Content-hash manifest for incremental builds
+from build_manifest import content_hash, file_hash, load_manifest, manifest_key, save_manifest, write_if_changed
+
+# Resumable crawls: per-move status, and outputs staged until the whole crawl is done
+from crawl_journal import CrawlJournal
+
+# Bounded memory extraction that reads the page as it is downloaded
+import stream_extract
 
 # List containing the HM moves that have the possiblity to come up. In these
 # cases, we want to change what is written to the text file for the title for
 # TM vs HM, as they are labeled the same in the HTML
 HM_moves = ["surf", "whirlpool", "cut", "fly", "strength", "flash", "waterfall"]
 
-# Call helper function to populate dictionary
-all_moves = get_moves()
-
-# Define folder name where move data for each move will be stored
-folder_name = "move_data"
-
-# Create the folder if it doesn't already exist
-os.makedirs(folder_name, exist_ok=True)
-
-# Loop through each move in the dictionary
-for move in all_moves:
-    # Define file name where data will be stored (name of current move)
-    filename =  move + ".txt"
-
-    # Define the file path for the current file (including the folder name)
-    file_path = os.path.join(folder_name, filename)
-
-    # Construct the URL that the data will be pulled from
-    curr_url = "https://www.serebii.net/attackdex-gs/" + move + ".shtml"
-
-    # Fetch the page, then parse HTML into a variable
-    response = requests.get(curr_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Need to process and distinguish the two "a" tags with the same name, so we get
-    # both "a" tags (using findAll to find all instances of the "a" tag "TM")
-    # As mentioned above, TM and Special Event tables are both labeled as "TM", hence
-    # the need to distinguish. Additionally, HM moves are also labeled as "TM".
-    TM_anchors = soup.find_all("a", {"name": "TM"})
-
-    # Declare TM_section as an empty variable so we can check to see if any data was
-    # stored in it from the TM data being processed
-    TM_section = any
-    event_section = any
-
-    # Prepare the text file with informaiton about the current move
-    with open(file_path, "w") as file:
-        file.write("Pokémon that can learn the move " + all_moves[move])
-
-    # Call helper function to pull the TM_anchors data (this will represent data for
-    # both moves learned via level up and moves learned through a special event)
-    event_section, TM_section = get_TM_anchors(TM_anchors)
-
-    # Get the levelup data section and the eggmove data section from the parsed HTML
-    levelup_section = soup.find("a", {"name": "level"})
-    eggmove_section = soup.find("a", {"name": "egg"})
-
-    # First to be processed is learning the move through level up
-    # Check to make sure levelup_section contains data before accessing the variable
-    if levelup_section:
-        # Call helper function to pull data, store results in array
-        levelup_data = get_byleveup(levelup_section)
-        # Write levelup data to text file
-        with open(file_path, "a") as file:
-            file.write("\n\nVia Level Up:\n")
-            file.write("\n".join(levelup_data))
-
-    # If there is no data in levelup_section, this means no Pokemon can learn the move 
-    # via level up. In this case, write "NONE" to that portion of the file
+# Number of pages fetched at the same time when no value is given on the command line
+default_workers = 8
+
+
+# Creates one HTTP session that every worker shares. The session keeps its connections
+# to serebii alive, so each page fetch reuses an open connection instead of doing a new
+# TCP/TLS handshake. The pool is sized to the number of workers so no worker waits on
+# another for a connection
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Paths of the files written for a move of the given generation: its JSON record and, if
+# with_text is True, its text file
+def move_output_paths(move, with_text=False, profile=gen2):
+    paths = [os.path.join(profile.records_folder, move + ".json")]
+    if with_text:
+        paths.append(os.path.join(profile.text_folder, move + ".txt"))
+    return paths
+
+
+# True if every file written for the move still holds what the last build wrote to it
+def outputs_unchanged(move, manifest, with_text=False, profile=gen2):
+    records = manifest.get("records", {})
+    return all(file_hash(path) == records.get(manifest_key(path))
+               for path in move_output_paths(move, with_text, profile))
+
+
+# Files written for a move: path -> contents (the record, and the text view if there is one)
+def move_outputs(move, record_json, text, profile=gen2):
+    return dict(zip(move_output_paths(move, text is not None, profile), [record_json, text]))
+
+
+# Writes the record (and the text view, if there is one) for a move, each in one write.
+# Files that already hold exactly this content are left alone. Returns True if any changed
+def write_move_outputs(move, record_json, text, manifest, profile=gen2):
+    changed = False
+    for path, contents in move_outputs(move, record_json, text, profile).items():
+        changed = write_if_changed(path, contents, manifest, "records") or changed
+    return changed
+
+
+# Writes (or with a journal, stages) a parsed move's files and reports the write to
+# metrics. Returns the move's name, the page hash and whether any file changed
+def write_stage(move, move_name, page_hash, record_json, text, manifest, profile=gen2, metrics=None, journal=None):
+    start = time.perf_counter()
+    if journal:
+        changed = journal.stage(move, move_outputs(move, record_json, text, profile), page_hash)
     else:
-        with open(file_path, "a") as file:
-            file.write("\n\nVia Level Up:\n")
-            file.write("NONE")
-
-
-    # Second to be processed is learning the move through TM/HM
-    if TM_section != any:
-        # Call helper function to pull data about learning the move through TM/HM
-        TM_data = get_byTM(TM_section)
-
-        with open(file_path, "a") as file:
-            # If there was TM data found, write it to the file
-            if TM_data:
-                file.write("\n\nVia TM:\n")
-                file.write("\n".join(TM_data)) 
-                # This handles the case where the selected move is an HM
-                # if(move in HM_moves):
-                #     file.write("\n\nVia HM:\n")
-                #     file.write("\n".join(TM_data))
-                # else:
-                #     file.write("\n\nVia TM:\n")
-                #     file.write("\n".join(TM_data)) 
-
-
-    # If there was no data found, write NONE to the file to indicate it        
+        changed = write_move_outputs(move, record_json, text, manifest, profile)
+    if metrics:
+        metrics.observe_stage("write", move, time.perf_counter() - start, changed=changed)
+    return move_name, page_hash, changed
+
+
+# Fetches, parses and writes the data for a single move. Each call only touches its own
+# files, so several of these can safely run at the same time. If the page has the same
+# hash as known_page_hash (the one from the last build) and the move's files still hold
+# what the last build wrote, the page isn't parsed again. Returns the move's name, the
+# page hash and whether any file changed. profile is the generation the move belongs to.
+# Each stage is reported to metrics and the parse is run under profiler, if given. With a
+# journal, each stage is recorded in it and the files are staged instead of written. With
+# streaming=True the page is parsed as it downloads (see stream_extract.py), so fetching
+# and parsing are one step, and the page hash only covers the part of the page read
+def process_move(session, move, move_name, manifest, parser=parser_backends[0], known_page_hash=None,
+                 with_text=False, profile=gen2, metrics=None, profiler=None, journal=None, streaming=False):
+    stage = "fetch"
+    try:
+        # Construct the URL that the data will be pulled from
+        curr_url = profile.page_url(move)
+
+        if streaming:
+            start = time.perf_counter()
+            record_json, text, seconds, result = stream_extract.parse_page_stream(move, move_name, curr_url, session,
+                                                                                  with_text, profiler)
+            page_hash = result.page_hash
+            if metrics:
+                # Whatever wasn't spent in the tokenizer was spent waiting for the page
+                metrics.observe_fetch(move, time.perf_counter() - start - seconds, result.read, result.retries)
+                metrics.observe_parse(move, seconds, record_json)
+            if journal:
+                journal.mark(move, "fetched", page_hash=page_hash)
+                journal.mark(move, "parsed", page_hash=page_hash)
+
+            # The page was read anyway, but unchanged files don't have to be written again
+            if page_hash == known_page_hash and outputs_unchanged(move, manifest, with_text, profile):
+                if journal:
+                    journal.mark(move, "written", page_hash=page_hash, changed=False, outputs=[])
+                return move_name, page_hash, False
+            stage = "write"
+            return write_stage(move, move_name, page_hash, record_json, text, manifest, profile, metrics, journal)
+
+        # Fetch the page (or replay it from the archive)
+        start = time.perf_counter()
+        html, retries = page_archive.get_page(curr_url, session, fetch_layer.validate_move_page, with_retries=True)
+        if metrics:
+            metrics.observe_fetch(move, time.perf_counter() - start, len(html.encode("utf-8")), retries)
+        page_hash = content_hash(html)
+        if journal:
+            journal.mark(move, "fetched", page_hash=page_hash)
+
+        # Nothing to do if the page is the same as last time and the files weren't touched since
+        if page_hash == known_page_hash and outputs_unchanged(move, manifest, with_text, profile):
+            if journal:
+                journal.mark(move, "written", page_hash=page_hash, changed=False, outputs=[])
+            return move_name, page_hash, False
+
+        # Parse the HTML and pull every learnset section out of the page in one pass
+        stage = "parse"
+        parse_args = (move, move_name, html, parser, with_text)
+        record_json, text, seconds = profiler.run(profile.parse_page, *parse_args) if profiler \
+            else profile.parse_page(*parse_args)
+        if metrics:
+            metrics.observe_parse(move, seconds, record_json)
+        if journal:
+            journal.mark(move, "parsed", page_hash=page_hash)
+
+        stage = "write"
+        return write_stage(move, move_name, page_hash, record_json, text, manifest, profile, metrics, journal)
+    except Exception as error:
+        if metrics:
+            metrics.count_failure(stage, move, error)
+        if journal:
+            journal.mark(move, "failed", stage=stage, error=f"{type(error).__name__}: {error}")
+        raise
+
+
+# Hash of everything that decides what gets written for a page. If the extraction code
+# or the parser backend changes, every page has to be parsed again. Streamed pages are
+# hashed only up to where the reading stopped, so their hashes are kept apart
+def extraction_code_hash(parser, streaming=False):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    code_files = [os.path.join(script_dir, "extract_move.py"), os.path.join(script_dir, "extract_helper_funcs.py")]
+    if streaming:
+        code_files.append(os.path.join(script_dir, "stream_extract.py"))
+        parser = "stream"
+    return content_hash("".join(file_hash(path) or "" for path in code_files) + parser)
+
+
+# Opens the journal for a crawl of one generation with this code and these outputs (see
+# crawl_journal.py), starting over if fresh=True. Returns it with the moves that still have
+# to be processed
+def open_journal(all_moves, code_hash, with_text, fresh=False, profile=gen2):
+    journal = CrawlJournal.open({"code": code_hash, "with_text": with_text, "generation": profile.name}, fresh)
+    pending = journal.pending(all_moves)
+    if len(pending) < len(all_moves):
+        print(f"Resuming the last crawl: {len(all_moves) - len(pending)} of {len(all_moves)} moves are already done")
+    return journal, pending
+
+
+# Ends a crawl. If every move is done, the staged files are moved to the output folders
+# and the manifest is saved; otherwise nothing is written and the journal is kept for the
+# next run. Page hashes are recorded under the generation's manifest names (profile.page_key).
+# Returns the names of the moves that are still not done
+def finish_crawl(journal, all_moves, manifest, code_hash, profile=gen2):
+    remaining = [all_moves[move] for move in journal.pending(all_moves)]
+    if remaining:
+        print(f"\n{len(remaining)} move(s) failed: {', '.join(remaining)}")
+        print("Nothing was written to the output folders. Run the crawl again to retry only these moves")
+        return remaining
+
+    page_keys = {move: profile.page_key(move_name) for move, move_name in all_moves.items()}
+    changed = journal.promote(page_keys, manifest, manifest.setdefault("pages", {}))
+    manifest["code"] = code_hash
+    save_manifest(manifest)
+    print(f"\nAll {len(all_moves)} moves done, {changed} file(s) updated")
+    return remaining
+
+
+# Processes every move in the dictionary. With a single worker the moves are handled one
+# after another in dictionary order; with more workers, up to that many pages are being
+# fetched and parsed at once through the shared session. With incremental=True, pages
+# that haven't changed since the last build are not parsed again. With with_text=True the
+# text view of each move is written as well as its record. metrics and profiler are
+# passed on to process_move. Progress is kept in the crawl journal, so a crawl that
+# stopped part way only processes the moves it hadn't finished (fresh=True starts over).
+# With streaming=True pages are parsed as they download, in bounded memory, and the
+# peak tokenizer buffer of each worker is printed at the end. profile is the generation the
+# moves belong to. Returns the names of the moves that failed
+def crawl_moves(all_moves, workers=default_workers, parser=parser_backends[0], incremental=False,
+                with_text=False, metrics=None, profiler=None, fresh=False, streaming=False, profile=gen2):
+    # Create the folders if they don't already exist
+    os.makedirs(profile.records_folder, exist_ok=True)
+    if with_text:
+        os.makedirs(profile.text_folder, exist_ok=True)
+
+    session = make_session(max(workers, 1))
+
+    # Page hashes from the last build are only trusted if the extraction code is the same
+    manifest = load_manifest()
+    code_hash = extraction_code_hash(parser, streaming)
+    known_pages = manifest.get("pages", {}) if incremental and manifest.get("code") == code_hash else {}
+    journal, pending = open_journal(all_moves, code_hash, with_text, fresh, profile)
+
+    # Prints a message confirming data for the current move was processed (or why it wasn't)
+    def report(move, future_or_call):
+        try:
+            _, _, changed = future_or_call()
+        except Exception as error:
+            print("Failed processing data for: ", all_moves[move], "-", error)
+            return
+        if changed:
+            print("Finished processing data for: ", all_moves[move])
+        else:
+            print("Unchanged: ", all_moves[move])
+
+    def run(move):
+        return process_move(session, move, all_moves[move], manifest, parser,
+                            known_pages.get(profile.page_key(all_moves[move])), with_text, profile, metrics=metrics,
+                            profiler=profiler, journal=journal, streaming=streaming)
+
+    if workers <= 1:
+        for move in pending:
+            report(move, lambda: run(move))
     else:
-        with open(file_path, "a") as file:
-            file.write("\n\nVia TM:\n")
-            file.write("NONE")    
-
-
-    # Third to be processed is learning the move through breeding
-    # Check and make sure eggmove_section contains data before accessing it
-    if eggmove_section:
-        # Call helper function to pull data, store results in array
-        eggmove_data = get_bybreeding(eggmove_section)
-        # Write eggmove data to text file
-        with open(file_path, "a") as file:
-            file.write("\n\nVia Breeding:\n")
-            if eggmove_data:
-                file.write("\n".join(eggmove_data))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run, move): move for move in pending}
+            # Report each move as soon as it is done (this is not dictionary order)
+            for future in as_completed(futures):
+                report(futures[future], future.result)
+
+    if streaming and stream_extract.worker_peaks:
+        print("\nStreaming extraction memory per worker:")
+        print(stream_extract.worker_peak_report())
+
+    return finish_crawl(journal, all_moves, manifest, code_hash, profile)
+
+
+# Keeps track of how much work one stage of the pipeline did: how many items it handled,
+# how long it spent busy on them, and how many bytes went through it
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy_seconds = 0.0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    # Records one item that took the given number of seconds
+    def add(self, seconds, size=0):
+        with self.lock:
+            self.count += 1
+            self.busy_seconds += seconds
+            self.bytes += size
+
+    # One line summary of the stage over a run that took wall_seconds
+    def summary(self, wall_seconds):
+        rate = self.count / wall_seconds if wall_seconds else 0
+        return (f"{self.name:<6} {self.count:>4} items  {rate:8.1f} items/s  "
+                f"busy {self.busy_seconds:7.2f}s  {self.bytes / 1e6:7.2f} MB")
+
+
+# Same as crawl_moves, but split into three stages connected by bounded queues:
+#   fetch - fetch_workers threads download the pages through the shared session
+#   parse - parse_processes worker processes parse the pages, so parsing (which is CPU
+#           bound and holds the GIL) runs on several cores at once
+#   write - the calling thread is the single writer that saves files and the manifest
+# At most queue_size pages wait to be parsed and at most queue_size results wait to be
+# written. When a later stage falls behind, the earlier one blocks instead of piling up
+# pages in memory. The throughput of each stage is printed at the end of the run, and
+# every stage is also reported to metrics if given. Progress is kept in the crawl journal
+# as in crawl_moves. profile is the generation the moves belong to (its page URLs, parse
+# function and output folders are used). Returns the names of the moves that failed
+def crawl_moves_pipelined(all_moves, fetch_workers=default_workers, parse_processes=os.cpu_count() or 1,
+                          parser=parser_backends[0], incremental=False, with_text=False, queue_size=None,
+                          metrics=None, fresh=False, profile=gen2):
+    # Create the folders if they don't already exist
+    os.makedirs(profile.records_folder, exist_ok=True)
+    if with_text:
+        os.makedirs(profile.text_folder, exist_ok=True)
+
+    queue_size = queue_size or 2 * parse_processes
+    session = make_session(max(fetch_workers, 1))
+
+    # Page hashes from the last build are only trusted if the extraction code is the same
+    manifest = load_manifest()
+    code_hash = extraction_code_hash(parser)
+    known_pages = manifest.get("pages", {}) if incremental and manifest.get("code") == code_hash else {}
+    journal, pending = open_journal(all_moves, code_hash, with_text, fresh, profile)
+
+    stats = {stage: StageStats(stage) for stage in ["fetch", "parse", "write"]}
+
+    # Moves still to be fetched
+    move_queue = queue.Queue()
+    for move in pending:
+        move_queue.put(move)
+
+    # Results waiting for the writer: (move, page hash, (record, text) or None if unchanged, error)
+    write_queue = queue.Queue(maxsize=queue_size)
+
+    # Free places in the parse stage
+    parse_slots = threading.BoundedSemaphore(queue_size)
+
+    # Hands a move that failed in one stage over to the writer. The result is posted even if
+    # counting or journaling the failure fails, so the writer always gets one result per move
+    def post_failure(move, page_hash, stage, error):
+        try:
+            if metrics:
+                metrics.count_failure(stage, move, error)
+            journal.mark(move, "failed", stage=stage, error=f"{type(error).__name__}: {error}")
+        except Exception as report_error:
+            print("Could not record the failure of: ", all_moves[move], "-", report_error)
+        write_queue.put((move, page_hash, None, error))
+
+    # Hands a finished parse over to the writer and frees its place in the parse stage
+    def on_parsed(move, page_hash, future):
+        try:
+            record_json, text, seconds = future.result()
+            stats["parse"].add(seconds, len(record_json))
+            if metrics:
+                metrics.observe_parse(move, seconds, record_json)
+            journal.mark(move, "parsed", page_hash=page_hash)
+        except Exception as error:
+            post_failure(move, page_hash, "parse", error)
+        else:
+            write_queue.put((move, page_hash, (record_json, text), None))
+        finally:
+            parse_slots.release()
+
+    # Fetch stage: keeps taking moves until there are none left. Anything that goes wrong
+    # with one move (the download, the journal, or handing the page to the parse processes,
+    # e.g. when the pool is broken) is posted to the writer as that move's failure, so the
+    # thread goes on with the next move and the writer never waits for a result that can't come
+    def fetch_worker(pool):
+        while True:
+            try:
+                move = move_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            page_hash = None
+            stage = "fetch"
+            try:
+                start = time.perf_counter()
+                html, retries = page_archive.get_page(profile.page_url(move), session, fetch_layer.validate_move_page,
+                                                      with_retries=True)
+                stats["fetch"].add(time.perf_counter() - start, len(html.encode("utf-8")))
+                if metrics:
+                    metrics.observe_fetch(move, time.perf_counter() - start, len(html.encode("utf-8")), retries)
+                page_hash = content_hash(html)
+                journal.mark(move, "fetched", page_hash=page_hash)
+
+                # Unchanged pages skip the parse stage entirely
+                if page_hash == known_pages.get(profile.page_key(all_moves[move])) and \
+                        outputs_unchanged(move, manifest, with_text, profile):
+                    journal.mark(move, "written", page_hash=page_hash, changed=False, outputs=[])
+                    write_queue.put((move, page_hash, None, None))
+                    continue
+
+                # Wait for a free place in the parse stage (this is the backpressure)
+                stage = "parse"
+                parse_slots.acquire()
+                try:
+                    future = pool.submit(profile.parse_page, move, all_moves[move], html, parser, with_text)
+                except BaseException:
+                    parse_slots.release()
+                    raise
+                future.add_done_callback(lambda future, move=move, page_hash=page_hash:
+                                         on_parsed(move, page_hash, future))
+            except Exception as error:
+                post_failure(move, page_hash, stage, error)
+
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=parse_processes) as pool:
+        fetchers = [threading.Thread(target=fetch_worker, args=(pool,), daemon=True) for _ in range(fetch_workers)]
+        for fetcher in fetchers:
+            fetcher.start()
+
+        # Write stage: one result per move, staged in the journal
+        for _ in range(len(pending)):
+            move, page_hash, outputs, error = write_queue.get()
+            move_name = all_moves[move]
+
+            if error is not None:
+                print("Failed processing data for: ", move_name, "-", error)
+                continue
+
+            if outputs is None:
+                print("Unchanged: ", move_name)
+                continue
+
+            write_start = time.perf_counter()
+            try:
+                changed = journal.stage(move, move_outputs(move, outputs[0], outputs[1], profile), page_hash)
+            except OSError as error:
+                if metrics:
+                    metrics.count_failure("write", move, error)
+                journal.mark(move, "failed", stage="write", error=f"{type(error).__name__}: {error}")
+                print("Failed processing data for: ", move_name, "-", error)
+                continue
+            stats["write"].add(time.perf_counter() - write_start, len(outputs[0]) if changed else 0)
+            if metrics:
+                metrics.observe_stage("write", move, time.perf_counter() - write_start, changed=changed)
+            if changed:
+                print("Finished processing data for: ", move_name)
             else:
-                file.write("NONE")
+                print("Unchanged: ", move_name)
 
-    # If there is no data in eggmove_section, this means no Pokemon can learn the move 
-    # via breeding. In this case, write "NONE" to that portion of the file
-    else:
-        with open(file_path, "a") as file:
-            file.write("\n\nVia Breeding:\n")
-            file.write("ERROR WITH DATA")
-
-
-    # Last to be processed is Pokemon that can learn the move through a Special Event
-    if event_section != any:
-        # Call helper function to pull the data and store in array
-        event_data = get_byspecialevent(event_section)
-
-        # After getting all Pokemon names, write them to the text file
-        with open(file_path, "a") as file:
-            # Make sure event_data contains info to access
-            if event_data:
-                file.write("\n\nVia Special Event:\n")
-                file.write("\n".join(event_data))
-    # Handle case where no Pokemon can learn move through a Special Event
+        for fetcher in fetchers:
+            fetcher.join()
+
+    wall_seconds = time.perf_counter() - start
+
+    print(f"\nPipeline finished in {wall_seconds:.2f}s ({fetch_workers} fetch threads, {parse_processes} parse processes)")
+    for stage in stats.values():
+        print(stage.summary(wall_seconds))
+    return finish_crawl(journal, all_moves, manifest, code_hash, profile)
+
+
+# Runs the crawl with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Extract learnset data for every move of a generation")
+    arg_parser.add_argument("--generation", choices=sorted(profiles), default=gen2.name,
+                            help="generation whose move pages are crawled (see generations.py)")
+    arg_parser.add_argument("--workers", type=int, default=default_workers,
+                            help="number of pages fetched at the same time (1 = sequential)")
+    arg_parser.add_argument("--parse-processes", type=int, default=0,
+                            help="parse pages in this many processes with a fetch/parse/write pipeline "
+                                 "(0 = parse in the fetch threads)")
+    arg_parser.add_argument("--parser", choices=parser_backends, default=parser_backends[0],
+                            help="HTML parser backend (see extract_helper_funcs.py)")
+    arg_parser.add_argument("--streaming", action="store_true",
+                            help="parse each page as it downloads and stop reading after the last learnset "
+                                 "table, in bounded memory (see stream_extract.py)")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="only parse and write moves whose page changed since the last build")
+    arg_parser.add_argument("--write-text", action="store_true",
+                            help="also write the human readable move_data/<move>.txt view of each move")
+    arg_parser.add_argument("--fresh", action="store_true",
+                            help="start over instead of resuming the unfinished crawl in crawl_journal.jsonl")
+    arg_parser.add_argument("--refresh-moves", action="store_true",
+                            help="download the move list from serebii again instead of using move_names.json")
+    arg_parser.add_argument("--archive-mode", choices=page_archive.archive_modes,
+                            help="off, record (cache pages in the archive) or replay (archive only, no network)")
+    arg_parser.add_argument("--archive", help="path of the page archive file")
+    arg_parser.add_argument("--rate", type=float, default=10.0,
+                            help="most requests per second to serebii (halved whenever it throttles us)")
+    arg_parser.add_argument("--max-retries", type=int, default=5,
+                            help="times a throttled, failed or invalid page download is retried")
+    arg_parser.add_argument("--events", metavar="FILE",
+                            help="write a JSON line per stage per move to FILE (- = standard error)")
+    arg_parser.add_argument("--metrics", metavar="FILE",
+                            help="write a Prometheus text summary of the crawl to FILE at the end (- = standard output)")
+    arg_parser.add_argument("--profile-parse", choices=ParseProfiler.modes,
+                            help="profile the parse stage with cProfile or tracemalloc (not with --parse-processes)")
+    arg_parser.add_argument("--profile-output", metavar="FILE",
+                            help="write the parse profile to FILE instead of standard output")
+    args = arg_parser.parse_args(argv)
+
+    if args.profile_parse and args.parse_processes > 0:
+        arg_parser.error("--profile-parse can't profile parses running in other processes")
+    if args.streaming and args.parse_processes > 0:
+        arg_parser.error("--streaming parses in the fetch threads, it can't be used with --parse-processes")
+
+    # Set up the page archive before any page (including the move list) is fetched
+    page_archive.configure(args.archive_mode, args.archive)
+
+    # Get the dictionary containing all moves of the generation (for Gen II from the local
+    # registry, unless asked to download it again)
+    profile = profiles[args.generation]
+    if args.refresh_moves:
+        if profile is not gen2:
+            arg_parser.error("--refresh-moves only downloads the Gen II move list")
+        all_moves = get_moves()
+        save_move_names(all_moves)
     else:
-        # Write message to file saying no Pokemon can learn the move via TM
-        with open(file_path, "a") as file:
-            file.write("\n\nVia Special Event:\n")
-            file.write("NONE")
+        all_moves = profile.load_moves()
+
+    events_stream = None
+    if args.events:
+        events_stream = sys.stderr if args.events == "-" else open(args.events, "w")
+    metrics = CrawlMetrics(events_stream) if args.events or args.metrics else None
+    fetch_layer.configure(rate=args.rate, concurrency=max(args.workers, 1), max_retries=args.max_retries,
+                          on_retry=metrics.count_retry if metrics else None)
+    profiler = ParseProfiler(args.profile_parse) if args.profile_parse else None
+
+    try:
+        if args.parse_processes > 0:
+            crawl_moves_pipelined(all_moves, args.workers, args.parse_processes, args.parser, args.incremental,
+                                  args.write_text, metrics=metrics, fresh=args.fresh, profile=profile)
+        else:
+            crawl_moves(all_moves, args.workers, args.parser, args.incremental, args.write_text, metrics, profiler,
+                        args.fresh, args.streaming, profile)
+    finally:
+        # The summary and the profile are written even if the crawl stopped on an error
+        if args.metrics:
+            metrics.write_summary(args.metrics)
+        if profiler:
+            if args.profile_output:
+                with open(args.profile_output, "w") as file:
+                    file.write(profiler.report())
+            else:
+                print(profiler.report())
+        if events_stream is not None and events_stream is not sys.stderr:
+            events_stream.close()
+
 
-    # Print message confirming data for the current move was processed
-    print("Finished processing data for: ", all_moves[move])
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# Polite, self-correcting download layer for serebii. Every page download in the scripts
+# goes through fetch() (page_archive.py calls it), which:
+#   - waits for a token from a token bucket, so requests never go out faster than the
+#     current rate
+#   - limits how many requests are in flight at once, and adapts that limit AIMD style:
+#     every successful response raises it a little (additive increase), every throttled
+#     response (429 or 5xx), timeout or dropped connection halves it and halves the rate
+#     (multiplicative decrease)
+#   - retries throttling (429), server errors (5xx), timeouts and dropped connections with
+#     exponential backoff and full jitter, honouring a Retry-After header (in seconds or as
+#     an HTTP date)
+#   - checks the page with a validator before handing it back, so an error page or a cut
+#     off response is retried, and in the end raises instead of being parsed as an empty
+#     learnset (which used to write NONE / ERROR WITH DATA into the move data)
+#
+# Configure it once from the command line options with configure(); the defaults are a
+# reasonable pace for a single crawl.
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests # type: ignore
+
+from extract_helper_funcs import section_anchor_pattern
+
+# HTTP status codes that mean "slow down / try again later"
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+# Raised when a page can't be fetched (or keeps failing validation) after every retry.
+# retries is how many times the request was retried before giving up
+class FetchError(Exception):
+    def __init__(self, message, retries=0):
+        super().__init__(message)
+        self.retries = retries
+
+
+# Raised by a validator when a page isn't the page that was asked for
+class InvalidPage(ValueError):
+    pass
+
+
+# A valid attackdex page has at least one learnset section anchor followed by a dextable,
+# and wasn't cut off before its end
+def validate_move_page(html):
+    if not section_anchor_pattern.search(html):
+        raise InvalidPage("no learnset section anchors (level, TM or egg) on the page")
+    if "dextable" not in html:
+        raise InvalidPage("no dextable on the page")
+    if "</html>" not in html[-2000:].lower():
+        raise InvalidPage("page ends before </html> (cut off response)")
+
+
+# A valid move list page has the move dropdowns
+def validate_movelist_page(html):
+    if 'name="SelectURL"' not in html:
+        raise InvalidPage("no move list (SelectURL dropdown) on the page")
+
+
+# Seconds to wait asked for by a Retry-After header, which is either a number of seconds or
+# an HTTP date ("Wed, 21 Oct 2015 07:28:00 GMT"). None if there is no usable header
+def retry_after_seconds(header):
+    header = (header or "").strip()
+    if header.isdigit():
+        return float(header)
+    try:
+        when = parsedate_to_datetime(header)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# Token bucket: tokens are added at rate per second up to burst, and each request takes one
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Waits until a token is available and takes it
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Limit on requests in flight that grows by one after every `increase_every` successes and
+# halves on throttling (never below 1 or above max_limit)
+class AdaptiveConcurrency:
+    def __init__(self, initial, max_limit, increase_every=10):
+        self.limit = initial
+        self.max_limit = max_limit
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    # Waits for a free place
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    # Gives the place back, adjusting the limit by the outcome of the request
+    def release(self, throttled):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.successes >= self.increase_every and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+class Fetcher:
+    # rate: requests per second to start at (it is halved on throttling and creeps back up
+    # to this on success), concurrency: most requests in flight at once
+    def __init__(self, rate=10.0, concurrency=8, max_retries=5, backoff_base=0.5, backoff_max=30.0,
+                 timeout=20.0, on_retry=None):
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, burst=max(1.0, rate))
+        self.concurrency = AdaptiveConcurrency(min(2, concurrency), concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        # Called as on_retry(url, reason) before each retry (e.g. CrawlMetrics.count_retry)
+        self.on_retry = on_retry
+
+    # Delay before retry number `attempt` (0-based): exponential backoff with full jitter
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # Halves the request rate after throttling, or creeps it back up after a success
+    def adjust_rate(self, throttled):
+        with self.bucket.lock:
+            if throttled:
+                self.bucket.rate = max(0.1, self.bucket.rate / 2)
+            else:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + 0.1)
+
+    # Downloads a page and returns its text and the number of retries it took. validate(text)
+    # should raise InvalidPage if the page isn't right. Raises FetchError once every retry
+    # has failed
+    def fetch(self, url, session=None, validate=None):
+        def handle(response):
+            text = response.text
+            if validate:
+                validate(text)
+            return text
+
+        return self.request(url, session, handle)
+
+    # Streams a page instead of downloading it whole: consume(chunks) is called with an
+    # iterator of text chunks of the body as they arrive and can stop reading at any point
+    # (the rest of the page is never downloaded). Its result is returned with the number of
+    # retries it took; validate(result) should raise InvalidPage if it isn't right, and the
+    # page is then streamed again
+    def stream(self, url, session=None, consume=None, validate=None, chunk_size=16384):
+        def handle(response):
+            response.encoding = response.encoding or "utf-8"
+            try:
+                result = consume(response.iter_content(chunk_size=chunk_size, decode_unicode=True))
+            finally:
+                response.close()
+            if validate:
+                validate(result)
+            return result
+
+        return self.request(url, session, handle, stream=True)
+
+    # Sends a GET request with the rate limit, concurrency limit and retries, and returns
+    # handle(response) for the first 200 response and the number of retries before it.
+    # handle raises InvalidPage for a page that isn't right, which is retried, but only
+    # 429/5xx responses, timeouts and dropped connections count as throttling and slow the
+    # crawl down; any other error from handle is raised as it is. A response that isn't
+    # handled is closed, so a streamed one gives its connection back to the pool before
+    # the retry
+    def request(self, url, session, handle, stream=False):
+        last_error = retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                reason = str(last_error)
+                if self.on_retry:
+                    self.on_retry(url, reason)
+                time.sleep(retry_after if retry_after is not None else self.backoff(attempt - 1))
+
+            retry_after = None
+            self.concurrency.acquire()
+            self.bucket.acquire()
+            throttled = False
+            try:
+                response = (session or requests).get(url, timeout=self.timeout, stream=stream)
+                if response.status_code in retry_statuses:
+                    throttled = True
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        retry_after = min(self.backoff_max, retry_after)
+                    last_error = FetchError(f"HTTP {response.status_code}")
+                    response.close()
+                    continue
+                if response.status_code != 200:
+                    # Other errors (404, ...) won't get better by retrying
+                    response.close()
+                    raise FetchError(f"{url}: HTTP {response.status_code}", attempt)
+
+                try:
+                    result = handle(response)
+                except InvalidPage as error:
+                    last_error = error
+                    continue
+                return result, attempt
+            except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as error:
+                # A streamed body can also be cut off half way
+                throttled = True
+                last_error = error
+            finally:
+                self.concurrency.release(throttled)
+                self.adjust_rate(throttled)
+
+        raise FetchError(f"{url}: giving up after {self.max_retries + 1} attempts ({last_error})", self.max_retries)
+
+
+# Fetcher shared by all the scripts in this folder, created on first use
+_default_fetcher = None
+
+
+# Sets up the shared fetcher (called from the command line options of each script)
+def configure(**options):
+    global _default_fetcher
+    _default_fetcher = Fetcher(**options)
+    return _default_fetcher
+
+
+# Downloads a page through the shared fetcher: (text, retries)
+def fetch(url, session=None, validate=None):
+    if _default_fetcher is None:
+        configure()
+    return _default_fetcher.fetch(url, session, validate)
+
+
+# Streams a page through the shared fetcher: (result, retries) (see Fetcher.stream)
+def stream(url, session=None, consume=None, validate=None, chunk_size=16384):
+    if _default_fetcher is None:
+        configure()
+    return _default_fetcher.stream(url, session, consume, validate, chunk_size)
@@ -0,0 +1,60 @@
+# Everything that differs between the games' attackdex sections on serebii, gathered in
+# one profile per generation: where the move pages live, how the move list is loaded,
+# how a page is parsed and where the results are written. The crawler and the crawl
+# scheduler (crawl_scheduler.py) only talk to a profile, so adding a generation means
+# adding a profile here, not copying the scripts.
+#
+# Only Gen II has a profile so far. Another generation needs its own move list and a
+# parse function for its table layout (the columns of the level up, TM and egg tables
+# are different in every generation), checked against its real pages before it is added.
+
+from dataclasses import dataclass
+import os
+from typing import Callable
+
+from build_manifest import script_dir
+from extract_helper_funcs import parse_page
+from move_registry import load_move_names
+
+
+@dataclass
+class GenerationProfile:
+    # Short name used on the command line ("gen2")
+    name: str
+    # URL the move pages live under, and the ending of each page's URL
+    base_url: str
+    page_suffix: str
+    # Returns the dictionary of moves (URL name -> display name)
+    load_moves: Callable[[], dict]
+    # Parses one page: (move, move_name, html, parser, with_text) -> (record JSON, text or None, seconds)
+    parse_page: Callable
+    # Folders the JSON records and the text views are written to (absolute, in the folder
+    # of the scripts, so the crawl writes where build_artifacts.py reads whatever the
+    # current directory is)
+    records_folder: str
+    text_folder: str
+    # Put in front of the move name in the build manifest, so the same move in two
+    # generations is tracked separately ("" for Gen II, which came first)
+    manifest_prefix: str = ""
+
+    # URL of a move's page
+    def page_url(self, move):
+        return self.base_url + move + self.page_suffix
+
+    # Name a move's page is tracked under in the build manifest
+    def page_key(self, move_name):
+        return self.manifest_prefix + move_name
+
+
+gen2 = GenerationProfile(
+    name="gen2",
+    base_url="https://www.serebii.net/attackdex-gs/",
+    page_suffix=".shtml",
+    load_moves=load_move_names,
+    parse_page=parse_page,
+    records_folder=os.path.join(script_dir, "move_records"),
+    text_folder=os.path.join(script_dir, "move_data"),
+)
+
+# Every generation that can be crawled, by name
+profiles = {profile.name: profile for profile in [gen2]}
@@ -1,9 +1,14 @@
 # This file is used to get a list of each possible Gen II move. The list can then be
 # used to loop through each move from Gen II to extract the data about it
 
-import requests # type: ignore
 from bs4 import BeautifulSoup # type: ignore
-import json
+
+# Pages are fetched through the record/replay archive
+from page_archive import get_page
+from fetch_layer import validate_movelist_page
+
+# Local copy of the move list
+from move_registry import move_names_path, save_move_names
 
 # Store in a function so it can be called from the main file
 def get_moves():
@@ -11,9 +16,8 @@ def get_moves():
     # list of moves in a <SELECT> div, which we will extract from
     curr_url = "https://www.serebii.net/attackdex-gs/ember.shtml"
 
-    # Fetch the page, then parse HTML into a variable
-    response = requests.get(curr_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # Fetch the page (or replay it from the archive), then parse HTML into a variable
+    soup = BeautifulSoup(get_page(curr_url, validate=validate_movelist_page), 'html.parser')
 
     # Find the <select> tags (the dropdown lists containing each move from Gen II are 
     # <SELECT> divs with the name "SelectURL"). Since there are three of these, we 
@@ -50,22 +54,13 @@ def get_moves():
     return move_dict
 
 
-# This part of the code creates a json file with the list of all moves (this is used
-# by the Javascript function for autocomplete/typeahead)
-
-all_moves = get_moves()
-# Extract only the formatted move names (values)
-moves_list = list(all_moves.values())
-
-# Path to save the JSON file
-
-json_file_path = "/Users/jacob/Desktop/Pokemon-Learnset-Finder/webapp/movelist.json"
-
-# Writing the moves list to a JSON file
-with open(json_file_path, 'w') as json_file:
-    json.dump(moves_list, json_file, indent=4)
-
-print(f"Movelist saved to {json_file_path}")
-
-
-
+# This part of the code refreshes the local move registry (move_names.json, read by
+# move_registry.py). The list of all moves used by the Javascript function for
+# autocomplete/typeahead (docs/movelist.json) and the move name index are built from it by
+# build_artifacts.py, together with the other files for the web page
+# (only when this file is run directly, so importing get_moves has no side effects)
+if __name__ == "__main__":
+    all_moves = get_moves()
+    save_move_names(all_moves)
+    print(f"Move registry saved to {move_names_path}")
+    print("Run build_artifacts.py to update movelist.json and the move name index")
@@ -0,0 +1,49 @@
+# Command line entry point for all the Gen II learnset tools:
+#   python learnset.py crawl [options]    crawl every move page (extract_move.py)
+#   python learnset.py crawl-all [options] crawl several generations with one shared pool
+#   python learnset.py single [move]      extract a single move (single_page.py)
+#   python learnset.py build              build the files for the web page in one pass
+#   python learnset.py query MOVE ...     find the Pokémon that can learn all of the moves
+#   python learnset.py learnset POKEMON   every move one Pokémon can learn, with levels
+#   python learnset.py batch [FILE]       answer a whole file of movesets (needs NumPy)
+#   python learnset.py serve [options]    answer queries over HTTP on this machine
+#   python learnset.py benchmark [options] time parsing, building and querying (JSON results)
+# Use "python learnset.py <command> --help" for the options of each command.
+#
+# Only the module for the chosen command is imported, so a query never loads the
+# crawling code (requests, BeautifulSoup) or touches the network.
+
+import argparse
+import importlib
+import sys
+
+# Command -> (modules whose main() is run in order, description)
+commands = {
+    "crawl": (["extract_move"], "crawl every Gen II move page and write the move records"),
+    "crawl-all": (["crawl_scheduler"], "crawl several generations at once with one shared pool"),
+    "single": (["single_page"], "extract the learnset data for a single move"),
+    "build": (["build_artifacts"], "build the JSON, binary and shard files from the move records"),
+    "query": (["query_moves"], "find the Pokémon that can learn all of the given moves"),
+    "learnset": (["species_learnsets"], "list every move one Pokémon can learn, by method, with levels"),
+    "batch": (["batch_query"], "answer a JSON Lines or CSV stream of movesets at once"),
+    "serve": (["query_service"], "serve intersection, learnset and move name queries over local HTTP"),
+    "benchmark": (["benchmarks"], "run the offline benchmarks and print the results as JSON"),
+}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="learnset",
+        description="Gen II Pokémon learnset tools",
+        epilog="commands:\n" + "\n".join(f"  {name:<10} {description}" for name, (_, description) in commands.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("command", choices=commands, help="the tool to run")
+    arg_parser.add_argument("args", nargs=argparse.REMAINDER, help="options for the tool")
+    args = arg_parser.parse_args(argv)
+
+    for module_name in commands[args.command][0]:
+        importlib.import_module(module_name).main(args.args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
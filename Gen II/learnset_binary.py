@@ -0,0 +1,281 @@
+# Compact binary version of docs/move_data.json. The JSON file repeats every species name
+# in every move's lists and has to be parsed completely before anything can be looked up;
+# this file stores each name once, the learners of each move as fixed size bitsets and
+# the learn levels as plain byte columns. MappedLearnset opens the file with mmap and
+# reads only the bytes a lookup needs, so loading it costs almost nothing.
+#
+# Layout (all integers little endian):
+#   header    magic b"LSET", version (u16), species count (u16), move count (u16),
+#             bytes per bitset (u16), then the offset (u32) of each section below
+#   species   name table: count + 1 offsets (u32) into a UTF-8 blob, in species ID order
+#   moves     name table, in move ID order
+#   species   IDs sorted by lower case name (u16), for binary search by name
+#   moves     IDs sorted by lower case name (u16)
+#   bitsets   for the union of every version and then for each version in
+#             learnset_index.versions: for each method in learnset_index.methods and then
+#             for "any" method, one bitset per move (bit N set = species N can learn it)
+#   levelup   entry offsets per move (u32, move count + 1), then per entry: species ID
+#             (u16), offsets into the Gold/Silver and Crystal level columns (u32, entry
+#             count + 1 each), then the two level columns (u8)
+#
+# Written by build_artifacts.py next to move_data.json.
+#   python learnset_binary.py [--benchmark]   # build it / compare loading it against the JSON
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+
+from build_manifest import load_manifest, save_manifest, write_if_changed
+from learnset_index import LearnsetIndex, methods, method_sections, move_data_path, versions
+
+magic = b"LSET"
+format_version = 2
+
+# Sections whose offsets are stored in the header, in order
+sections = ["species_names", "move_names", "species_order", "move_order", "bitsets",
+            "entry_offsets", "entry_species", "offsets_GS", "offsets_C", "levels_GS", "levels_C"]
+
+header_format = "<4sHHHH" + "I" * len(sections)
+
+# Where the binary file is written
+binary_path = os.path.join(os.path.dirname(move_data_path), "learnset.bin")
+
+
+# Packs a list of unsigned integers of the given struct type ("H", "I" or "B")
+def pack_array(type_code, values):
+    return struct.pack(f"<{len(values)}{type_code}", *values)
+
+
+# Name table: offsets into a UTF-8 blob, followed by the blob
+def pack_names(names):
+    blob = b""
+    offsets = [0]
+    for name in names:
+        blob += name.encode("utf-8")
+        offsets.append(len(blob))
+    return pack_array("I", offsets) + blob
+
+
+# Builds the binary file contents from the contents of move_data.json
+def build_binary(move_data):
+    index = LearnsetIndex.from_move_data(move_data)
+    bitset_bytes = (len(index.species) + 7) // 8
+
+    entry_offsets = [0]
+    entry_species = []
+    level_columns = {"GS": [], "C": []}
+    level_offsets = {"GS": [0], "C": [0]}
+    for sections_data in move_data.values():
+        for entry in sections_data.get(method_sections["levelup"], []):
+            entry_species.append(index.species_ids[entry["Pokemon"]])
+            levels = entry.get("Levels", [])
+            for position, version in enumerate(["GS", "C"]):
+                level_columns[version] += levels[position] if position < len(levels) else []
+                level_offsets[version].append(len(level_columns[version]))
+        entry_offsets.append(len(entry_species))
+
+    bitsets = b""
+    tables = [index.learners[method] for method in methods] + [index.any_learners]
+    for version in versions:
+        tables += [index.version_learners[version][method] for method in methods]
+        tables.append(index.version_any_learners[version])
+    for masks in tables:
+        bitsets += b"".join(mask.to_bytes(bitset_bytes, "little") for mask in masks)
+
+    blobs = {
+        "species_names": pack_names(index.species),
+        "move_names": pack_names(index.moves),
+        "species_order": pack_array("H", sorted(range(len(index.species)), key=lambda i: index.species[i].lower())),
+        "move_order": pack_array("H", sorted(range(len(index.moves)), key=lambda i: index.moves[i].lower())),
+        "bitsets": bitsets,
+        "entry_offsets": pack_array("I", entry_offsets),
+        "entry_species": pack_array("H", entry_species),
+        "offsets_GS": pack_array("I", level_offsets["GS"]),
+        "offsets_C": pack_array("I", level_offsets["C"]),
+        "levels_GS": pack_array("B", level_columns["GS"]),
+        "levels_C": pack_array("B", level_columns["C"]),
+    }
+
+    offsets = []
+    position = struct.calcsize(header_format)
+    for section in sections:
+        offsets.append(position)
+        position += len(blobs[section])
+    header = struct.pack(header_format, magic, format_version, len(index.species), len(index.moves),
+                         bitset_bytes, *offsets)
+    return header + b"".join(blobs[section] for section in sections)
+
+
+class MappedLearnset:
+    # Opens a binary learnset file. Only the header is read here, everything else is read
+    # from the mapped file when a lookup needs it
+    def __init__(self, path=binary_path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = struct.unpack_from(header_format, self.data)
+        if fields[0] != magic or fields[1] != format_version:
+            raise ValueError(f"{path} is not a version {format_version} learnset file")
+        self.species_count, self.move_count, self.bitset_bytes = fields[2:5]
+        self.offsets = dict(zip(sections, fields[5:]))
+
+    def close(self):
+        self.data.close()
+
+    # Reads element i of an array of the given struct type in a section
+    def _read(self, section, type_code, i):
+        return struct.unpack_from("<" + type_code, self.data, self.offsets[section] + i * struct.calcsize(type_code))[0]
+
+    # Name number i of a name table
+    def _name(self, section, count, i):
+        start = self._read(section, "I", i)
+        end = self._read(section, "I", i + 1)
+        blob = self.offsets[section] + (count + 1) * 4
+        return self.data[blob + start:blob + end].decode("utf-8")
+
+    def species_name(self, species_id):
+        return self._name("species_names", self.species_count, species_id)
+
+    def move_name(self, move_id):
+        return self._name("move_names", self.move_count, move_id)
+
+    # Binary search for a name (any letter case) in one of the sorted ID arrays.
+    # Raises KeyError if it isn't there
+    def _find(self, order_section, name_of, count, name):
+        wanted = name.lower()
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if name_of(self._read(order_section, "H", middle)).lower() < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count:
+            found = self._read(order_section, "H", low)
+            if name_of(found).lower() == wanted:
+                return found
+        raise KeyError(name)
+
+    def species_id(self, name):
+        return self._find("species_order", self.species_name, self.species_count, name)
+
+    def move_id(self, name):
+        return self._find("move_order", self.move_name, self.move_count, name)
+
+    # Bitset of the Pokémon that can learn a move through any of the given methods (all
+    # methods if none are given), in the given game version (or in any of them). Raises
+    # KeyError for a move that isn't in the file
+    def learners_mask(self, move_name, learn_methods=None, version=None):
+        move_id = self.move_id(move_name)
+        # Tables of the union view come first, then those of each version
+        first_table = (versions.index(version) + 1) * (len(methods) + 1) if version else 0
+        mask = 0
+        for method in learn_methods or [None]:
+            table = first_table + (methods.index(method) if method else len(methods))
+            start = self.offsets["bitsets"] + (table * self.move_count + move_id) * self.bitset_bytes
+            mask |= int.from_bytes(self.data[start:start + self.bitset_bytes], "little")
+        return mask
+
+    # Bitset of the Pokémon that can learn every one of the moves
+    def query_mask(self, move_names, learn_methods=None, version=None):
+        masks = sorted((self.learners_mask(move_name, learn_methods, version) for move_name in move_names),
+                       key=int.bit_count)
+        if not masks:
+            return 0
+        result = masks[0]
+        for mask in masks[1:]:
+            if not result:
+                break
+            result &= mask
+        return result
+
+    # Names of the species in a bitset, in species ID order
+    def decode(self, mask):
+        names = []
+        while mask:
+            lowest = mask & -mask
+            names.append(self.species_name(lowest.bit_length() - 1))
+            mask ^= lowest
+        return names
+
+    # Names of the Pokémon that can learn every one of the moves
+    def query(self, move_names, learn_methods=None, version=None):
+        return self.decode(self.query_mask(move_names, learn_methods, version))
+
+    # Level up learners of a move as (species, Gold/Silver levels, Crystal levels)
+    def levels(self, move_name):
+        move_id = self.move_id(move_name)
+        entries = []
+        for entry in range(self._read("entry_offsets", "I", move_id), self._read("entry_offsets", "I", move_id + 1)):
+            columns = []
+            for version in ["GS", "C"]:
+                start = self._read("offsets_" + version, "I", entry)
+                end = self._read("offsets_" + version, "I", entry + 1)
+                columns.append(list(self.data[self.offsets["levels_" + version] + start:
+                                              self.offsets["levels_" + version] + end]))
+            entries.append((self.species_name(self._read("entry_species", "H", entry)), *columns))
+        return entries
+
+
+# Code run in a fresh interpreter for each loader in the benchmark. The modules are
+# imported before the clock starts, so only loading the data is timed. Prints the load
+# time, the time for one query and how much the resident memory grew (KB)
+benchmark_code = """
+import sys, time
+from learnset_index import LearnsetIndex
+from learnset_binary import MappedLearnset
+
+def rss():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * 4
+
+before = rss()
+start = time.perf_counter()
+learnset = LearnsetIndex.load(sys.argv[2]) if sys.argv[1] == "json" else MappedLearnset(sys.argv[2])
+loaded = time.perf_counter()
+learnset.query(["Curse", "Rest", "Earthquake", "Surf"])
+queried = time.perf_counter()
+print((loaded - start) * 1000, (queried - loaded) * 1000, rss() - before)
+"""
+
+
+# Loads the JSON and the binary file in separate fresh interpreters and prints load time,
+# query time and memory used for each (best of several runs, needs Linux for /proc)
+def benchmark(json_path=move_data_path, path=binary_path, runs=5):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    for kind, file_path in [("json", json_path), ("binary", path)]:
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", benchmark_code, kind, file_path], cwd=script_dir,
+                                    capture_output=True, text=True, check=True).stdout
+            results.append([float(value) for value in output.split()])
+        load, query, rss = (min(column) for column in zip(*results))
+        print(f"{kind:>6}: {os.path.getsize(file_path) / 1024:7.1f} KB on disk, load {load:7.2f} ms, "
+              f"first query {query:6.3f} ms, resident memory +{rss / 1024:.2f} MB")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build the binary learnset file from move_data.json")
+    arg_parser.add_argument("--benchmark", action="store_true",
+                            help="compare loading the binary file against loading the JSON file")
+    args = arg_parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    with open(move_data_path, "r") as file:
+        data = build_binary(json.load(file))
+    manifest = load_manifest()
+    if write_if_changed(binary_path, data, manifest):
+        print(f"Wrote {len(data)} bytes to {binary_path}")
+    else:
+        print(f"{binary_path} is already up to date")
+    save_manifest(manifest)
+
+
+if __name__ == "__main__":
+    main()
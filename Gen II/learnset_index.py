@@ -0,0 +1,238 @@
+# Inverted index for "which Pokémon can learn all of these moves". Every species and every
+# move gets an integer ID, and for each move and each way of learning it the set of
+# Pokémon that can learn it is stored as a bitset (a Python int where bit N is set if the
+# species with ID N can learn the move). A query with several moves is then just a few
+# bitwise ANDs, done starting with the move the fewest Pokémon can learn so the result
+# shrinks as quickly as possible (and stops as soon as it is empty).
+#
+# Level up moves also keep their learn levels, separately for each game version (Gold/Silver
+# and Crystal), so a query can ask which Pokémon know the moves by level N:
+#   - per move, the species sorted by the level they learn it at, with a running bitset, so
+#     "learners of this move by level N" is one binary search
+#   - per species, a timeline of its level up moves sorted by level, so "what does this
+#     Pokémon know by level N" is one binary search too
+# A level limit only applies to level up; TMs, breeding and events don't depend on level.
+#
+# The learner bitsets are also kept per game version, so a query for one cartridge only
+# counts what can be learned in it (a Pokémon that learns a move by level up in Crystal
+# only doesn't count for Gold/Silver). A version query reads its own bitsets, at the same
+# cost as the union view for "any Gen II game" (the bitsets without a version). The move
+# pages only split the level up table by version; the TM, breeding and event tables apply
+# to every version, so those bitsets are shared between the versions.
+#
+# Built from docs/move_data.json (written by build_artifacts.py).
+
+import bisect
+import functools
+import json
+import os
+
+# Ways a move can be learned, and the section of move_data.json each one comes from
+methods = ["levelup", "TM", "breeding", "event"]
+method_sections = {
+    "levelup": "Via Level Up",
+    "TM": "Via TM",
+    "breeding": "Via Breeding",
+    "event": "Via Special Event",
+}
+
+# Game versions with their own learn levels: Gold/Silver and Crystal. In move_data.json
+# each level up entry has "Levels": [[Gold/Silver levels], [Crystal levels]]
+versions = ["GS", "C"]
+
+# Data file the index is built from
+move_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docs", "move_data.json")
+
+
+class LearnsetIndex:
+    def __init__(self):
+        # Species ID -> name, and name -> species ID
+        self.species = []
+        self.species_ids = {}
+        # Move ID -> display name, and display name -> move ID
+        self.moves = []
+        self.move_ids = {}
+        # Method -> list of bitsets, one per move ID
+        self.learners = {method: [] for method in methods}
+        # Bitset of every method combined, one per move ID
+        self.any_learners = []
+        # The same two per game version: version -> method -> bitsets, and version -> bitsets
+        self.version_learners = {version: {method: [] for method in methods} for version in versions}
+        self.version_any_learners = {version: [] for version in versions}
+        # Version -> list (one per move ID) of (sorted levels, running bitsets): running
+        # bitset i holds every species that learns the move at levels[i] or below
+        self.level_learners = {version: [] for version in versions}
+        # Version -> species ID -> (sorted levels, move IDs learned at those levels). add_move
+        # only collects (level, move ID) pairs in unsorted_timelines; sort_timelines() sorts
+        # each species' pairs once, instead of inserting into the sorted lists move by move
+        self.timelines = {version: {} for version in versions}
+        self.unsorted_timelines = {version: {} for version in versions}
+
+    # Returns the ID of a species, giving it a new one the first time it is seen
+    def intern_species(self, name):
+        species_id = self.species_ids.get(name)
+        if species_id is None:
+            species_id = len(self.species)
+            self.species.append(name)
+            self.species_ids[name] = species_id
+        return species_id
+
+    # Adds one move with its learners (method -> list of species names) and its level up
+    # levels (version -> {species name: levels}). Without levels, every level up learner
+    # counts for every version
+    def add_move(self, move_name, learners_by_method, levels_by_version=None):
+        move_id = len(self.moves)
+        self.move_ids[move_name] = move_id
+        self.moves.append(move_name)
+
+        combined = 0
+        for method in methods:
+            mask = 0
+            for name in learners_by_method.get(method, []):
+                mask |= 1 << self.intern_species(name)
+            self.learners[method].append(mask)
+            combined |= mask
+        self.any_learners.append(combined)
+
+        for version in versions:
+            # Each species counts from the lowest level it learns the move at
+            first_levels = sorted((min(levels), self.intern_species(name))
+                                  for name, levels in (levels_by_version or {}).get(version, {}).items() if levels)
+            running = []
+            mask = 0
+            for level, species_id in first_levels:
+                mask |= 1 << species_id
+                running.append(mask)
+                self.unsorted_timelines[version].setdefault(species_id, []).append((level, move_id))
+            self.level_learners[version].append(([level for level, _ in first_levels], running))
+
+            # Learners in this version: level up only counts the species with levels in it
+            version_combined = 0
+            for method in methods:
+                mask = self.learners[method][move_id]
+                if method == "levelup" and levels_by_version is not None:
+                    mask = 0
+                    for name, levels in levels_by_version.get(version, {}).items():
+                        if levels:
+                            mask |= 1 << self.species_ids[name]
+                self.version_learners[version][method].append(mask)
+                version_combined |= mask
+            self.version_any_learners[version].append(version_combined)
+
+    # Sorts the level up moves collected by add_move into the species' timelines
+    def sort_timelines(self):
+        for version in versions:
+            for species_id, pairs in self.unsorted_timelines[version].items():
+                levels, move_ids = self.timelines[version].get(species_id, ([], []))
+                pairs.extend(zip(levels, move_ids))
+                pairs.sort()
+                self.timelines[version][species_id] = ([level for level, _ in pairs], [move_id for _, move_id in pairs])
+            self.unsorted_timelines[version] = {}
+
+    # Builds the index from the contents of move_data.json
+    @classmethod
+    def from_move_data(cls, move_data):
+        index = cls()
+        for move_name, sections in move_data.items():
+            learners_by_method = {}
+            for method in methods:
+                entries = sections.get(method_sections[method], [])
+                # Level up entries also hold the levels, the other sections are just names
+                learners_by_method[method] = [entry["Pokemon"] if isinstance(entry, dict) else entry
+                                              for entry in entries]
+            levels_by_version = {version: {} for version in versions}
+            for entry in sections.get(method_sections["levelup"], []):
+                for version, levels in zip(versions, entry.get("Levels", [])):
+                    levels_by_version[version].setdefault(entry["Pokemon"], []).extend(levels)
+            index.add_move(move_name, learners_by_method, levels_by_version)
+        index.sort_timelines()
+        return index
+
+    # Builds the index from a move_data.json file
+    @classmethod
+    def load(cls, path=move_data_path):
+        with open(path, "r") as file:
+            return cls.from_move_data(json.load(file))
+
+    # Bitset of the Pokémon that learn a move by level up at max_level or below, in one
+    # game version (or in either of them if no version is given)
+    def learners_by_level(self, move_name, max_level, version=None):
+        move_id = self.move_ids[move_name]
+        mask = 0
+        for each_version in [version] if version else versions:
+            levels, running = self.level_learners[each_version][move_id]
+            position = bisect.bisect_right(levels, max_level)
+            if position:
+                mask |= running[position - 1]
+        return mask
+
+    # Bitset of the Pokémon that can learn a move through any of the given methods (all
+    # methods if none are given), in the given game version (or in any of them). With a
+    # max_level, level up only counts up to that level. Raises KeyError for a move that
+    # isn't in the index
+    def learners_mask(self, move_name, learn_methods=None, max_level=None, version=None):
+        move_id = self.move_ids[move_name]
+        learners = self.version_learners[version] if version else self.learners
+        if max_level is None:
+            if not learn_methods:
+                return (self.version_any_learners[version] if version else self.any_learners)[move_id]
+            mask = 0
+            for method in learn_methods:
+                mask |= learners[method][move_id]
+            return mask
+
+        mask = 0
+        for method in learn_methods or methods:
+            if method == "levelup":
+                mask |= self.learners_by_level(move_name, max_level, version)
+            else:
+                mask |= learners[method][move_id]
+        return mask
+
+    # Bitset of the Pokémon that can learn every one of the moves
+    def query_mask(self, move_names, learn_methods=None, max_level=None, version=None):
+        masks = sorted((self.learners_mask(move_name, learn_methods, max_level, version) for move_name in move_names),
+                       key=int.bit_count)
+        if not masks:
+            return 0
+        result = masks[0]
+        for mask in masks[1:]:
+            if not result:
+                break
+            result &= mask
+        return result
+
+    # Level up moves a Pokémon has learned by max_level in one game version (or either),
+    # in the order it learns them. Raises KeyError for a species that isn't in the index
+    def moves_by_level(self, name, max_level, version=None):
+        species_id = self.species_ids[name]
+        if any(self.unsorted_timelines.values()):
+            self.sort_timelines()
+        learned = []
+        for each_version in [version] if version else versions:
+            levels, move_ids = self.timelines[each_version].get(species_id, ([], []))
+            learned += zip(levels[:bisect.bisect_right(levels, max_level)], move_ids)
+        move_names = []
+        for _, move_id in sorted(learned):
+            if self.moves[move_id] not in move_names:
+                move_names.append(self.moves[move_id])
+        return move_names
+
+    # Names of the species in a bitset, in species ID order
+    def decode(self, mask):
+        names = []
+        while mask:
+            lowest = mask & -mask
+            names.append(self.species[lowest.bit_length() - 1])
+            mask ^= lowest
+        return names
+
+    # Names of the Pokémon that can learn every one of the moves
+    def query(self, move_names, learn_methods=None, max_level=None, version=None):
+        return self.decode(self.query_mask(move_names, learn_methods, max_level, version))
+
+
+# The index built from docs/move_data.json, built the first time it is needed
+@functools.lru_cache(maxsize=None)
+def load_index(path=move_data_path):
+    return LearnsetIndex.load(path)
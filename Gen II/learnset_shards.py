@@ -0,0 +1,137 @@
+# Splits docs/move_data.json into small files, one per move and one per species, so a
+# consumer only downloads or opens the few files a query needs instead of the whole data
+# set. A manifest lists every shard with a hash and size of its contents; the web page
+# uses the hash to ask for a fresh copy only when a shard actually changed.
+#
+# Written to docs/shards/:
+#   manifest.json      {"moves": {display name: {"file", "hash", "size"}}, "species": {...}}
+#   moves/<move>.json  {"name": ..., "learners": [every Pokémon that learns it],
+#                       "Via Level Up": [...], "Via TM": [...], ...} as in move_data.json
+#   species/<name>.json {"name": ..., "Via Level Up": [{"Move": ..., "Levels": [...]}],
+#                        "Via TM": [moves], "Via Breeding": [...], "Via Special Event": [...]}
+#
+#   python learnset_shards.py   # (re)build the shards from move_data.json
+# (build_artifacts.py builds them together with every other file)
+
+import argparse
+import functools
+import json
+import os
+import re
+
+from build_manifest import content_hash, load_manifest, save_manifest, write_if_changed
+from learnset_index import method_sections, move_data_path
+from move_registry import load_move_names
+from species_learnsets import build_species_learnsets
+
+# Folder the shards are written to
+shards_dir = os.path.join(os.path.dirname(move_data_path), "shards")
+shard_manifest_path = os.path.join(shards_dir, "manifest.json")
+
+
+# File name (without .json) of a move's shard: the move's serebii URL name ("Fire Blast" -> "fireblast")
+def move_file_name(move_name):
+    url_names = {display: move for move, display in load_move_names().items()}
+    return url_names.get(move_name) or re.sub(r"[^a-z0-9]", "", move_name.lower())
+
+
+# File name (without .json) of a species' shard ("Mr. Mime" -> "mr-mime", "Nidoran♀" -> "nidoran-f")
+def species_file_name(name):
+    name = name.lower().replace("♀", "-f").replace("♂", "-m").replace("'", "")
+    return re.sub(r"[^a-z0-9]+", "-", name).strip("-")
+
+
+# Builds the contents of every shard from the contents of move_data.json (and the
+# species learnsets built from it, if they were already built; see species_learnsets.py).
+# Returns two dictionaries, move name -> shard and species name -> shard
+def build_shards(move_data, species_learnsets=None):
+    move_shards = {}
+    for move_name, sections in move_data.items():
+        learners = {}
+        for section in method_sections.values():
+            for entry in sections.get(section, []):
+                learners[entry["Pokemon"] if isinstance(entry, dict) else entry] = None
+        move_shards[move_name] = {"name": move_name, "learners": list(learners), **sections}
+
+    if species_learnsets is None:
+        species_learnsets = build_species_learnsets(move_data)
+    species_shards = {species: {"name": species, **sections} for species, sections in species_learnsets.items()}
+    return move_shards, species_shards
+
+
+# Writes the shards and their manifest, deleting shards of moves or species that are no
+# longer in the data. Returns the shard manifest and how many files were written. build is
+# the build manifest to track the files in; if none is given it is loaded and saved here
+def write_shards(move_data, output_dir=shards_dir, build=None, species_learnsets=None):
+    move_shards, species_shards = build_shards(move_data, species_learnsets)
+    save = build is None
+    if save:
+        build = load_manifest()
+    shard_manifest = {}
+    written = 0
+
+    for kind, shards, file_name in [("moves", move_shards, move_file_name),
+                                    ("species", species_shards, species_file_name)]:
+        folder = os.path.join(output_dir, kind)
+        os.makedirs(folder, exist_ok=True)
+        entries = shard_manifest[kind] = {}
+
+        for name, shard in shards.items():
+            text = json.dumps(shard, ensure_ascii=False, separators=(",", ":"))
+            relative_path = f"{kind}/{file_name(name)}.json"
+            written += write_if_changed(os.path.join(output_dir, relative_path), text, build)
+            entries[name] = {"file": relative_path,
+                             "hash": content_hash(text)[:16],
+                             "size": len(text.encode("utf-8"))}
+
+        current = {os.path.basename(entry["file"]) for entry in entries.values()}
+        for stale in set(os.listdir(folder)) - current:
+            os.remove(os.path.join(folder, stale))
+
+    written += write_if_changed(os.path.join(output_dir, "manifest.json"),
+                                json.dumps(shard_manifest, ensure_ascii=False, separators=(",", ":")), build)
+    if save:
+        save_manifest(build)
+    return shard_manifest, written
+
+
+# Shard manifest, read the first time it is needed
+@functools.lru_cache(maxsize=None)
+def load_shard_manifest(path=shard_manifest_path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+# Reads one shard. kind is "moves" or "species", name is the display name. Raises
+# KeyError if there is no shard for that name
+def load_shard(kind, name, output_dir=shards_dir):
+    entry = load_shard_manifest(os.path.join(output_dir, "manifest.json"))[kind][name]
+    with open(os.path.join(output_dir, entry["file"]), "r") as file:
+        return json.load(file)
+
+
+# Everything about one move (learners and the move_data.json sections), read from its shard only
+def load_move_shard(move_name):
+    return load_shard("moves", move_name)
+
+
+# Every move one Pokémon learns, grouped by method, read from its shard only
+def load_species_shard(name):
+    return load_shard("species", name)
+
+
+# Builds the shards with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Split move_data.json into per-move and per-species shards")
+    arg_parser.parse_args(argv)
+
+    with open(move_data_path, "r") as file:
+        move_data = json.load(file)
+    shard_manifest, written = write_shards(move_data)
+
+    print(f"{len(shard_manifest['moves'])} move shards and {len(shard_manifest['species'])} species shards "
+          f"in {shards_dir} ({written} files written)")
+
+
+if __name__ == "__main__":
+    main()
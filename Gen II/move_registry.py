@@ -0,0 +1,169 @@
+# Local registry of every Gen II move: the name used in serebii's URLs ("fireblast") mapped
+# to the name shown to users ("Fire Blast"). It is read from move_names.json, a copy of
+# what get_moves() returns, so looking up a move name never needs the network. The file is
+# only read the first time a name is needed, and only the standard library is imported, so
+# any tool can use it without slowing down its start.
+#
+# Names are resolved through a name index (docs/move_index.json, also used by the web
+# page) built from the registry by build_move_index(). Every way of writing a move name
+# ("Sand-Attack", "sand attack", "sandattack", "SAND_ATTACK") is normalized to the same
+# key, so a lookup is one dictionary access. The index also has a sorted key list for
+# prefix search (typeahead) and a table of one-letter deletions for spotting typos.
+#
+# To refresh both files from serebii: python get_gen2_movelist.py
+
+import bisect
+import functools
+import json
+import os
+import re
+
+# Where the registry is stored
+move_names_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "move_names.json")
+
+# Where the name index is stored (next to the web page, which uses it too)
+move_index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docs", "move_index.json")
+
+
+# Returns the dictionary of every move (URL name -> display name), reading the file the
+# first time it is called
+@functools.lru_cache(maxsize=None)
+def load_move_names(path=move_names_path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+# Saves a dictionary of moves (as returned by get_moves()) as the new registry
+def save_move_names(move_dict, path=move_names_path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(move_dict, file, indent=4, ensure_ascii=False)
+    os.replace(temp_path, path)
+    load_move_names.cache_clear()
+
+
+# Key every spelling of a name is reduced to: lower case letters and digits only
+# ("Sand-Attack" -> "sandattack", "Conversion 2" -> "conversion2")
+def normalize_name(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+# Every string that is the key with one letter removed
+def deletions(key):
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+# Builds the name index from a dictionary of moves (URL name -> display name). Moves get
+# IDs in the order of the dictionary. The index holds:
+#   moves    - display name of each move ID
+#   slugs    - URL name of each move ID
+#   aliases  - normalized key -> move ID (for the display name and the URL name)
+#   prefixes - [key, move ID] pairs sorted by key, for prefix search
+#   deletes  - key with one letter removed -> IDs of the moves it came from, for typos
+def build_move_index(move_dict):
+    aliases = {}
+    for move_id, (move, move_name) in enumerate(move_dict.items()):
+        for alias in (move, move_name):
+            aliases.setdefault(normalize_name(alias), move_id)
+
+    deletes = {}
+    for key, move_id in aliases.items():
+        for deleted in deletions(key):
+            if move_id not in deletes.setdefault(deleted, []):
+                deletes[deleted].append(move_id)
+
+    return {
+        "moves": list(move_dict.values()),
+        "slugs": list(move_dict),
+        "aliases": aliases,
+        "prefixes": sorted([key, move_id] for key, move_id in aliases.items()),
+        "deletes": dict(sorted(deletes.items())),
+    }
+
+
+# Saves the name index for a dictionary of moves
+def save_move_index(move_dict, path=move_index_path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(build_move_index(move_dict), file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+    load_move_index.cache_clear()
+
+
+# Returns the name index, reading the file the first time it is called
+@functools.lru_cache(maxsize=None)
+def load_move_index(path=move_index_path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+# Returns the ID of a move given any spelling of its display name or URL name, or None
+def resolve_move(name):
+    return load_move_index()["aliases"].get(normalize_name(name))
+
+
+# Returns the display name of a move given either its URL name or its display name (in
+# any letter case, with or without spaces and hyphens), or None if there is no such move
+def display_name(name):
+    move_id = resolve_move(name)
+    return None if move_id is None else load_move_index()["moves"][move_id]
+
+
+# Display names of the moves whose name starts with the prefix (spacing, hyphens and
+# letter case are ignored), in alphabetical order
+def moves_with_prefix(prefix, limit=None):
+    index = load_move_index()
+    prefixes = index["prefixes"]
+    key = normalize_name(prefix)
+    matches = []
+    for position in range(bisect.bisect_left(prefixes, [key]), len(prefixes)):
+        alias, move_id = prefixes[position]
+        if not alias.startswith(key) or len(matches) == limit:
+            break
+        if index["moves"][move_id] not in matches:
+            matches.append(index["moves"][move_id])
+    return matches
+
+
+# Edit distance between two strings, where swapping two neighbouring letters counts as one edit
+def edit_distance(first, second):
+    # distances[i][j] is the distance between the first i letters of first and the first j of second
+    distances = [[i + j if i == 0 or j == 0 else 0 for j in range(len(second) + 1)] for i in range(len(first) + 1)]
+    for i in range(1, len(first) + 1):
+        for j in range(1, len(second) + 1):
+            distances[i][j] = min(distances[i - 1][j] + 1, distances[i][j - 1] + 1,
+                                  distances[i - 1][j - 1] + (first[i - 1] != second[j - 1]))
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                distances[i][j] = min(distances[i][j], distances[i - 2][j - 2] + 1)
+    return distances[-1][-1]
+
+
+# Display names of the moves that are at most one typo (a missing, extra, wrong or
+# swapped letter) away from the name, closest first. Only the index entries sharing a
+# one-letter deletion with the name are compared, so this doesn't scan every move
+def fuzzy_matches(name):
+    index = load_move_index()
+    key = normalize_name(name)
+    if key in index["aliases"]:
+        return [index["moves"][index["aliases"][key]]]
+
+    candidates = set(index["deletes"].get(key, []))
+    for deleted in deletions(key):
+        if deleted in index["aliases"]:
+            candidates.add(index["aliases"][deleted])
+        candidates.update(index["deletes"].get(deleted, []))
+
+    scored = []
+    for move_id in candidates:
+        distance = min(edit_distance(key, normalize_name(alias))
+                       for alias in (index["moves"][move_id], index["slugs"][move_id]))
+        if distance <= 1:
+            scored.append((distance, index["moves"][move_id]))
+    return [move_name for _, move_name in sorted(scored)]
+
+
+# Error message for a move name that isn't known, suggesting the moves it could be a typo of
+def unknown_move_message(move):
+    message = f'Move "{move}" not found in data.'
+    suggestions = fuzzy_matches(move)
+    return message + f" Did you mean {' or '.join(suggestions)}?" if suggestions else message
@@ -0,0 +1,238 @@
+# Record/replay store for the raw serebii pages the scripts download. Every page is kept
+# in one compressed zip archive, keyed by its URL (the zip's central directory acts as the
+# index, so a single page can be read without touching the others).
+#
+# Modes (set with configure() or the SEREBII_ARCHIVE_MODE environment variable):
+#   off    - always download the page, never touch the archive (the original behavior)
+#   record - serve the page from the archive if it is there, otherwise download it and
+#            add it to the archive. Delete the archive file (and its .pending folder) to
+#            force a full re-download
+#   replay - serve pages only from the archive and never use the network. A page that
+#            was never recorded is an error
+#
+# This lets the parsing code be changed and re-run over every move with no network access
+# (for example in an offline build sandbox), paying only for the parsing.
+#
+# Downloads go through fetch_layer.py (rate limiting, retries and page validation), so only
+# pages that passed validation are ever recorded.
+#
+# The zip file itself is never written to in place: appending to a zip overwrites its
+# index, and a run killed before the new index is written would lose every page in it.
+# Pages recorded by a run are written one file each (atomically) to a folder next to the
+# archive (<archive>.pending/), and when the archive is closed they are added to a copy
+# of the zip that then replaces it. A run that is killed leaves the archive as it was and
+# its new pages in the folder; the next run serves them from there and adds them when it
+# closes.
+
+import atexit
+import codecs
+import os
+import shutil
+import signal
+import sys
+import threading
+import zipfile
+from urllib.parse import quote, unquote
+
+import fetch_layer
+
+# Valid archive modes
+archive_modes = ["off", "record", "replay"]
+
+# Archive used when nothing else is configured (lives next to the scripts)
+default_archive_path = os.environ.get(
+    "SEREBII_ARCHIVE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_archive.zip"))
+
+
+# Raised in replay mode when a page was never recorded
+class PageNotArchived(LookupError):
+    pass
+
+
+# Turns a URL into the name it is stored under inside the zip file
+# ("https://www.serebii.net/attackdex-gs/curse.shtml" -> "www.serebii.net/attackdex-gs/curse.shtml")
+def archive_key(url):
+    return url.split("://", 1)[-1]
+
+
+class PageArchive:
+    def __init__(self, path=default_archive_path, mode="off"):
+        if mode not in archive_modes:
+            raise ValueError(f"Unknown archive mode '{mode}', expected one of {archive_modes}")
+        self.path = path
+        self.mode = mode
+        # Folder the pages recorded since the zip was last written are kept in
+        self.pending_dir = path + ".pending"
+        # Reading the zip and recording pages from several threads at once goes through this lock
+        self.lock = threading.Lock()
+        self.zip = None
+        self.names = set()
+        # Key -> file of the pages waiting in the pending folder
+        self.pending = {}
+
+        if mode == "off":
+            return
+        if os.path.exists(path):
+            self.zip = zipfile.ZipFile(path, "r")
+            self.names = set(self.zip.namelist())
+        if os.path.isdir(self.pending_dir):
+            for file_name in os.listdir(self.pending_dir):
+                if not file_name.endswith(".tmp"):
+                    self.pending[unquote(file_name)] = os.path.join(self.pending_dir, file_name)
+        if mode == "replay" and self.zip is None and not self.pending:
+            raise FileNotFoundError(f"Page archive {path} does not exist, record it first")
+
+    # Text of an archived page, or None if it isn't archived. Must be called with the lock held
+    def _read(self, key):
+        if key in self.names:
+            return self.zip.read(key).decode("utf-8")
+        if key in self.pending:
+            with open(self.pending[key], "r", encoding="utf-8") as file:
+                return file.read()
+        return None
+
+    # Writes a downloaded page to the pending folder (temporary file, then renamed, so a
+    # page file is never half written). Must be called with the lock held
+    def _record(self, key, text):
+        if key in self.names or key in self.pending:
+            # Another thread recorded the same page in the meantime
+            return
+        os.makedirs(self.pending_dir, exist_ok=True)
+        page_path = os.path.join(self.pending_dir, quote(key, safe=""))
+        with open(page_path + ".tmp", "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(page_path + ".tmp", page_path)
+        self.pending[key] = page_path
+
+    # Returns the page text for the URL, using the archive according to the mode. A
+    # downloaded page is checked with validate (see fetch_layer.py) before it is used. With
+    # with_retries=True the number of times the download was retried is returned with the
+    # text (0 for an archived page)
+    def get(self, url, session=None, validate=None, with_retries=False):
+        key = archive_key(url)
+
+        if self.mode != "off":
+            with self.lock:
+                text = self._read(key)
+            if text is not None:
+                return (text, 0) if with_retries else text
+            if self.mode == "replay":
+                raise PageNotArchived(f"{url} is not in the page archive {self.path}")
+
+        # Download the page (through the shared session if one was given)
+        text, retries = fetch_layer.fetch(url, session, validate)
+
+        if self.mode == "record":
+            with self.lock:
+                self._record(key, text)
+
+        return (text, retries) if with_retries else text
+
+    # Streams the page for the URL: consume(chunks) is called with an iterator of text
+    # chunks of the page and its result is returned (see fetch_layer.Fetcher.stream).
+    # validate(result) should raise InvalidPage if the result isn't right. In replay mode
+    # the page is decompressed chunk by chunk; in record mode a page that isn't archived
+    # yet is downloaded whole (it has to be recorded whole anyway, after validate_text)
+    # and then fed in chunks. With with_retries=True the number of times the download was
+    # retried is returned with the result, as in get
+    def stream(self, url, session=None, consume=None, validate=None, chunk_size=16384, validate_text=None,
+               with_retries=False):
+        key = archive_key(url)
+        retries = 0
+
+        if self.mode == "replay" and key in self.names:
+            # A zip opened only for reading can have several members open at once
+            with self.zip.open(key) as member:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                chunks = iter(lambda: decoder.decode(member.read(chunk_size)), "")
+                result = consume(chunks)
+        elif self.mode != "off":
+            text, retries = self.get(url, session, validate_text, with_retries=True)
+            result = consume(text[start:start + chunk_size] for start in range(0, len(text), chunk_size))
+        else:
+            result, retries = fetch_layer.stream(url, session, consume, validate, chunk_size)
+            return (result, retries) if with_retries else result
+
+        if validate:
+            try:
+                validate(result)
+            except fetch_layer.InvalidPage as error:
+                raise fetch_layer.FetchError(f"{url}: archived page is not valid ({error})")
+        return (result, retries) if with_retries else result
+
+    # Adds the pending pages to the zip: they are written to a copy of it, which then
+    # replaces it, so the archive is whole at every moment. The pending files are removed
+    # once the new zip is in place
+    def _merge_pending(self):
+        temp_path = self.path + ".tmp"
+        if os.path.exists(self.path):
+            shutil.copyfile(self.path, temp_path)
+        with zipfile.ZipFile(temp_path, "a", compression=zipfile.ZIP_DEFLATED) as new_zip:
+            for key, page_path in sorted(self.pending.items()):
+                if key not in self.names:
+                    with open(page_path, "rb") as file:
+                        new_zip.writestr(key, file.read())
+        os.replace(temp_path, self.path)
+        shutil.rmtree(self.pending_dir, ignore_errors=True)
+        self.pending = {}
+
+    # Closes the archive, adding the pages recorded by this run (and any left by a run
+    # that was killed) to the zip file
+    def close(self):
+        with self.lock:
+            if self.zip is not None:
+                self.zip.close()
+                self.zip = None
+            if self.mode == "record" and self.pending:
+                self._merge_pending()
+
+
+# Archive shared by all the scripts in this folder, created on first use
+_default_archive = None
+
+
+# Sets up the shared archive (called from the command line options of each script)
+def configure(mode=None, path=None):
+    global _default_archive
+    if _default_archive is not None:
+        _default_archive.close()
+    _default_archive = PageArchive(path or default_archive_path,
+                                   mode or os.environ.get("SEREBII_ARCHIVE_MODE", "off"))
+    if _default_archive.mode == "record":
+        _exit_on_sigterm()
+    return _default_archive
+
+
+# Turns SIGTERM (kill, a job timeout) into a normal exit, so the recorded pages are added
+# to the zip by the exit handler below. Pages recorded before the signal are safe either
+# way; this only saves the next run from adding them. Left alone if the program set its
+# own handler, or when not called from the main thread (signals can only be set there)
+def _exit_on_sigterm():
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+
+# Fetches a page through the shared archive. This is what the scripts call instead of
+# requests.get(url).text
+def get_page(url, session=None, validate=None, with_retries=False):
+    if _default_archive is None:
+        configure()
+    return _default_archive.get(url, session, validate, with_retries)
+
+
+# Make sure the pages recorded by a run are added to the zip when the program exits
+@atexit.register
+def _close_default_archive():
+    if _default_archive is not None:
+        _default_archive.close()
+
+
+# Streams a page through the shared archive (see PageArchive.stream)
+def stream_page(url, session=None, consume=None, validate=None, chunk_size=16384, validate_text=None,
+                with_retries=False):
+    if _default_archive is None:
+        configure()
+    return _default_archive.stream(url, session, consume, validate, chunk_size, validate_text, with_retries)
@@ -0,0 +1,98 @@
+# Answers "which Pokémon can learn all of these moves" with the bitset index in
+# learnset_index.py (the Python equivalent of findCommonPokemon in docs/script.js).
+#   python query_moves.py "Curse" "Rest" ... [--method levelup --method TM]
+#   python query_moves.py "Curse" "Rest" --version GS                 # learnable in Gold/Silver
+#   python query_moves.py "Curse" "Rest" --max-level 20 --version C   # level up by level 20 in Crystal
+#   python query_moves.py Surf "Ice Beam" --type Water --stat "Speed>=80"   # see species_table.py
+# Moves can be given by their display name or their URL name, in any letter case and
+# with or without spaces and hyphens. A misspelled move gets a suggestion.
+#
+# --max-level only limits level up: TMs, breeding and events don't depend on level, so a
+# Pokémon that gets a move from one of those still counts. With --max-level each result is
+# printed with the ways it learns each move, e.g. "Snorlax (Curse: levelup; Rest: TM)";
+# add --method levelup to only count level up.
+
+import argparse
+
+from learnset_index import load_index, methods, versions
+from move_registry import display_name, unknown_move_message
+from species_table import load_species_table, parse_stat_filter
+
+
+# Finds the Pokémon that can learn every move in the list, optionally only counting the
+# given ways of learning them (see learnset_index.methods), only what can be learned in
+# one game version (see learnset_index.versions, default: any of them), and only level up
+# moves learned by max_level. Types and stat filters (see species_table.parse_stat_filter) only keep the
+# Pokémon that have every one of the types and pass every filter. Raises KeyError for a
+# move that doesn't exist
+def find_common_pokemon(moves, learn_methods=None, max_level=None, version=None, types=(), stat_filters=()):
+    index = load_index()
+    move_names = index_move_names(index, moves)
+    mask = index.query_mask(move_names, learn_methods, max_level, version)
+    if mask and (types or stat_filters):
+        mask &= load_species_table().species_mask(index.species_ids, types, stat_filters)
+    return index.decode(mask)
+
+
+# Display names of the moves as spelled in the index. Raises KeyError for a move that
+# doesn't exist
+def index_move_names(index, moves):
+    move_names = []
+    for move in moves:
+        move_name = display_name(move)
+        if move_name is None or move_name not in index.move_ids:
+            raise KeyError(unknown_move_message(move))
+        move_names.append(move_name)
+    return move_names
+
+
+# Ways a Pokémon from the results of a query learns each of the moves (move name -> list
+# of methods), with the same limits as the query
+def learn_methods_by_move(species, moves, learn_methods=None, max_level=None, version=None):
+    index = load_index()
+    bit = 1 << index.species_ids[species]
+    return {move_name: [method for method in learn_methods or methods
+                        if index.learners_mask(move_name, [method], max_level, version) & bit]
+            for move_name in index_move_names(index, moves)}
+
+
+# Runs a query with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Find the Pokémon that can learn all of the given moves")
+    arg_parser.add_argument("moves", nargs="+", help="up to four moves (display names or URL names)")
+    arg_parser.add_argument("--method", action="append", choices=methods, dest="methods",
+                            help="only count this way of learning the moves (can be given more than once)")
+    arg_parser.add_argument("--max-level", type=int,
+                            help="only count level up moves learned at this level or below (TMs, breeding and "
+                                 "events count at any level; each result shows how it learns the moves)")
+    arg_parser.add_argument("--version", choices=versions,
+                            help="only count what can be learned in this game version: GS (Gold/Silver) or C "
+                                 "(Crystal) (default: any Gen II game)")
+    arg_parser.add_argument("--type", action="append", dest="types", default=[],
+                            help="only keep Pokémon of this type (can be given more than once)")
+    arg_parser.add_argument("--stat", action="append", dest="stats", default=[],
+                            help='only keep Pokémon whose base stat passes this filter, e.g. "Speed>=80"')
+    args = arg_parser.parse_args(argv)
+
+    try:
+        stat_filters = [parse_stat_filter(text) for text in args.stats]
+        results = find_common_pokemon(args.moves, args.methods, args.max_level, args.version, args.types,
+                                      stat_filters)
+    except KeyError as error:
+        arg_parser.error(error.args[0])
+    except (ValueError, FileNotFoundError) as error:
+        arg_parser.error(str(error))
+
+    if results and args.max_level is not None:
+        for species in results:
+            by_move = learn_methods_by_move(species, args.moves, args.methods, args.max_level, args.version)
+            labels = [f"{move}: {', '.join(found)}" for move, found in by_move.items()]
+            print(f"{species} ({'; '.join(labels)})")
+    elif results:
+        print("\n".join(results))
+    else:
+        print("No Pokémon found that can learn all the selected moves.")
+
+
+if __name__ == "__main__":
+    main()
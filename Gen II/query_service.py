@@ -0,0 +1,225 @@
+# Small local HTTP service that answers learnset queries, so internal tools don't each
+# have to download and intersect the JSON files themselves. The Gen II data is loaded
+# once when the service starts and answers are kept in an LRU cache. It only uses the
+# standard library (asyncio) and doesn't talk to anything outside this machine.
+#   python query_service.py [--host 127.0.0.1] [--port 8642]
+#
+# Endpoints (all GET, all answer JSON):
+#   /intersect?moves=Curse,Rest[&method=TM&method=levelup][&version=C][&max_level=20]
+#       Pokémon that can learn every one of the moves (optionally only by some methods,
+#       only in one game version, and only counting level up moves learned by max_level)
+#   /intersect?moves=Surf&type=Water&stat=Speed>=80
+#       the same, only keeping Pokémon of every given type that pass every base stat filter
+#       (see species_table.py)
+#   /pokemon/<name>[?version=C][&max_level=20][&levels=1]
+#       every move the Pokémon can learn, grouped by method (one lookup in the reverse
+#       index, see species_learnsets.py); with levels=1 level up moves come with their levels
+#   /moves?prefix=thu[&limit=10]
+#       move names starting with the prefix, ignoring case, spaces and hyphens (for typeahead)
+
+import argparse
+import asyncio
+import functools
+import json
+import traceback
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from learnset_index import load_index, methods, versions
+from move_registry import display_name, load_move_index, moves_with_prefix, unknown_move_message
+from species_learnsets import load_species_learnsets
+from species_table import load_species_table, parse_stat_filter
+
+# Answers kept for repeated queries
+cache_size = 4096
+
+default_host = "127.0.0.1"
+default_port = 8642
+
+# Largest request body read (and thrown away, as every endpoint is GET); a longer one is
+# answered with 413 and the connection is closed
+max_body_size = 64 * 1024
+
+
+# Turns a list of move names (any spelling the registry understands) into the key used
+# for the cache: the display names, without duplicates and sorted, so the same set of
+# moves in any order or spelling shares one cache entry. Raises KeyError for unknown moves
+def normalize_moves(moves):
+    index = load_index()
+    move_names = set()
+    for move in moves:
+        move_name = display_name(move)
+        if move_name is None or move_name not in index.move_ids:
+            raise KeyError(unknown_move_message(move))
+        move_names.add(move_name)
+    return tuple(sorted(move_names))
+
+
+# Pokémon that can learn every move in the (normalized) set, of every one of the types and
+# passing every stat filter
+@functools.lru_cache(maxsize=cache_size)
+def intersect(move_names, learn_methods, max_level=None, version=None, types=(), stat_filters=()):
+    index = load_index()
+    mask = index.query_mask(move_names, learn_methods or None, max_level, version)
+    if mask and (types or stat_filters):
+        mask &= load_species_table().species_mask(index.species_ids, types, stat_filters)
+    return index.decode(mask)
+
+
+# Returns the Pokémon's name as spelled in the data (any letter case is accepted).
+# Raises KeyError for unknown Pokémon
+def species_name(name):
+    return load_species_learnsets().name(name)
+
+
+# Every move a Pokémon can learn, grouped by method, optionally only in one game version
+# and only counting level up moves learned by max_level. With levels=True level up moves
+# are {"Move", "Levels"} instead of names
+@functools.lru_cache(maxsize=cache_size)
+def pokemon_learnset(species, version=None, max_level=None, levels=False):
+    learnsets = load_species_learnsets()
+    if levels:
+        return learnsets.learnset(species, version=version, max_level=max_level)
+    return learnsets.move_names(species, version=version, max_level=max_level)
+
+
+# Works out the answer for one request path. Returns (status, body dict)
+def handle_path(target):
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    try:
+        if url.path == "/intersect":
+            moves = [move for value in params.get("moves", []) for move in value.split(",") if move.strip()]
+            learn_methods = tuple(sorted(set(params.get("method", []))))
+            if not moves:
+                return 400, {"error": "Give at least one move with ?moves="}
+            if any(method not in methods for method in learn_methods):
+                return 400, {"error": f"method must be one of {methods}"}
+            max_level = int(params["max_level"][0]) if "max_level" in params else None
+            version = params.get("version", [None])[0]
+            if version is not None and version not in versions:
+                return 400, {"error": f"version must be one of {versions}"}
+            types = tuple(sorted({value.lower() for value in params.get("type", [])}))
+            stat_filters = tuple(sorted({parse_stat_filter(value) for value in params.get("stat", [])}))
+            move_names = normalize_moves(moves)
+            return 200, {"moves": list(move_names),
+                         "pokemon": intersect(move_names, learn_methods, max_level, version, types, stat_filters)}
+
+        if url.path.startswith("/pokemon/"):
+            species = species_name(unquote(url.path[len("/pokemon/"):]))
+            max_level = int(params["max_level"][0]) if "max_level" in params else None
+            version = params.get("version", [None])[0]
+            if version is not None and version not in versions:
+                return 400, {"error": f"version must be one of {versions}"}
+            levels = params.get("levels", ["0"])[0] not in ("0", "false", "")
+            return 200, {"pokemon": species, "moves": pokemon_learnset(species, version, max_level, levels)}
+
+        if url.path == "/moves":
+            limit = int(params["limit"][0]) if "limit" in params else None
+            return 200, {"moves": moves_with_prefix(params.get("prefix", [""])[0], limit)}
+
+    except KeyError as error:
+        return 404, {"error": error.args[0]}
+    except (ValueError, FileNotFoundError) as error:
+        return 400, {"error": str(error)}
+
+    return 404, {"error": f"Unknown path {url.path}"}
+
+
+status_text = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Content Too Large", 500: "Internal Server Error"}
+
+
+# Serves one client connection (keep-alive, so a client can send many requests on it)
+async def handle_connection(reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            # Read the headers, keeping only Connection: close and how long the body is
+            keep_alive = True
+            content_length = "0"
+            chunked = False
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                name, value = name.strip().lower(), value.strip().lower()
+                if name == "connection" and value == "close":
+                    keep_alive = False
+                elif name == "content-length":
+                    content_length = value
+                elif name == "transfer-encoding" and value != "identity":
+                    chunked = True
+
+            # A body (which no endpoint uses) is read and thrown away, so it isn't taken for
+            # the next request on the connection. One that can't be skipped ends the connection
+            parts = request_line.decode("latin-1").split()
+            if chunked:
+                status, body = 411, {"error": "Send a Content-Length instead of a chunked body"}
+                keep_alive = False
+            elif not content_length.isdigit():
+                status, body = 400, {"error": "Content-Length must be a number"}
+                keep_alive = False
+            elif int(content_length) > max_body_size:
+                status, body = 413, {"error": f"Request bodies are limited to {max_body_size} bytes"}
+                keep_alive = False
+            else:
+                await reader.readexactly(int(content_length))
+                if len(parts) < 2 or parts[0] != "GET":
+                    status, body = 405, {"error": "Only GET is supported"}
+                else:
+                    try:
+                        status, body = handle_path(parts[1])
+                    except Exception:
+                        # A bug in a handler answers 500 instead of dropping the connection
+                        traceback.print_exc()
+                        status, body = 500, {"error": "Internal error while answering the request"}
+
+            payload = json.dumps(body).encode("utf-8")
+            writer.write(f"HTTP/1.1 {status} {status_text[status]}\r\n"
+                         f"Content-Type: application/json; charset=utf-8\r\n"
+                         f"Content-Length: {len(payload)}\r\n"
+                         f"Access-Control-Allow-Origin: *\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+# Starts the service and returns the asyncio server (the data is loaded before it starts
+# accepting connections, so the first request isn't slow)
+async def start_service(host=default_host, port=default_port):
+    load_index()
+    load_move_index()
+    load_species_learnsets()
+    return await asyncio.start_server(handle_connection, host, port)
+
+
+async def serve(host=default_host, port=default_port):
+    server = await start_service(host, port)
+    print(f"Serving learnset queries on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# Runs the service with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Serve learnset queries over HTTP on this machine")
+    arg_parser.add_argument("--host", default=default_host, help="address to listen on (default: %(default)s)")
+    arg_parser.add_argument("--port", type=int, default=default_port, help="port to listen on (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Reverse learnset index: every move each Pokémon can learn, grouped by method, with the
+# level up levels. The other files are keyed by move, so "what can Heracross learn" would
+# mean going through every move's learners; this one is keyed by species, so the answer is
+# one dictionary lookup. It is written by build_artifacts.py in the same pass as
+# move_data.json, to docs/species_learnsets.json:
+#   {"Heracross": {"Via Level Up": [{"Move": "Tackle", "Levels": [[1], [1]]}, ...],
+#                  "Via TM": [moves], "Via Breeding": [...], "Via Special Event": [...]}, ...}
+# Levels are [[Gold/Silver levels], [Crystal levels]], as in move_data.json. The per-species
+# shards (see learnset_shards.py) are written from the same entries.
+#   python species_learnsets.py Heracross
+#   python species_learnsets.py "mr. mime" --method levelup --version C --max-level 30
+
+import argparse
+import functools
+import json
+import os
+import re
+
+from learnset_index import method_sections, methods, move_data_path, versions
+
+# Where the index is written
+species_learnsets_path = os.path.join(os.path.dirname(move_data_path), "species_learnsets.json")
+
+
+# Key a species is looked up by ("Mr. Mime", "mr mime" -> "mrmime", "Nidoran♀" -> "nidoranf")
+def species_key(name):
+    name = name.lower().replace("♀", "f").replace("♂", "m")
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+# Adds one move's move_data.json entry (see build_artifacts.detailed_entry) to the index
+# (species name -> sections), giving a species its entry the first time it is seen
+def add_move_entry(learnsets, move_name, entry):
+    for section in method_sections.values():
+        for learner in entry.get(section, []):
+            species = learner["Pokemon"] if isinstance(learner, dict) else learner
+            sections = learnsets.get(species)
+            if sections is None:
+                sections = learnsets[species] = {section: [] for section in method_sections.values()}
+            if isinstance(learner, dict):
+                sections[section].append({"Move": move_name, "Levels": learner.get("Levels", [])})
+            else:
+                sections[section].append(move_name)
+
+
+# Builds the index from the contents of move_data.json (move name -> entry)
+def build_species_learnsets(move_data):
+    learnsets = {}
+    for move_name, entry in move_data.items():
+        add_move_entry(learnsets, move_name, entry)
+    return learnsets
+
+
+# Lowest level in a level up entry, in one version or in any of them (None if it has none)
+def first_level(entry, version=None):
+    levels = entry["Levels"]
+    if version is not None:
+        levels = levels[versions.index(version)] if len(levels) > versions.index(version) else []
+    else:
+        levels = [level for version_levels in levels for level in version_levels]
+    return min(levels) if levels else None
+
+
+class SpeciesLearnsets:
+    def __init__(self, learnsets):
+        self.learnsets = learnsets
+        # Lookup key -> name as spelled in the data, so any letter case and punctuation
+        # ("mr mime", "MR. MIME") finds the species
+        self.keys = {species_key(name): name for name in learnsets}
+
+    def __len__(self):
+        return len(self.learnsets)
+
+    # Reads the index from a species_learnsets.json file
+    @classmethod
+    def load(cls, path=species_learnsets_path):
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    # Returns the Pokémon's name as spelled in the data. Raises KeyError for unknown Pokémon
+    def name(self, species):
+        if species in self.learnsets:
+            return species
+        name = self.keys.get(species_key(species))
+        if name is None:
+            raise KeyError(f'Pokémon "{species}" not found in data.')
+        return name
+
+    # Every move the Pokémon can learn, as method (see learnset_index.methods) -> moves. Level
+    # up moves are {"Move", "Levels"} sorted by the level they are first learned at, the
+    # others are move names. Optionally only the given methods, only what can be learned in
+    # one game version (its levels only), and only level up moves learned by max_level.
+    # Raises KeyError for unknown Pokémon
+    def learnset(self, species, learn_methods=None, version=None, max_level=None):
+        sections = self.learnsets[self.name(species)]
+        result = {}
+        for method in learn_methods or methods:
+            entries = sections[method_sections[method]]
+            if method == "levelup":
+                entries = [entry for entry in entries if first_level(entry, version) is not None]
+                if max_level is not None:
+                    entries = [entry for entry in entries if first_level(entry, version) <= max_level]
+                entries = sorted(entries, key=lambda entry: first_level(entry, version))
+                if version is not None:
+                    index = versions.index(version)
+                    entries = [{"Move": entry["Move"], "Levels": entry["Levels"][index]} for entry in entries]
+            result[method] = list(entries)
+        return result
+
+    # Move names only, per method (the shape of the service's /pokemon/ answer)
+    def move_names(self, species, learn_methods=None, version=None, max_level=None):
+        return {method: [entry["Move"] if isinstance(entry, dict) else entry for entry in entries]
+                for method, entries in self.learnset(species, learn_methods, version, max_level).items()}
+
+
+# The index from docs/species_learnsets.json, read the first time it is needed. Raises
+# FileNotFoundError if it hasn't been built yet
+@functools.lru_cache(maxsize=None)
+def load_species_learnsets(path=species_learnsets_path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} hasn't been built yet: run build_artifacts.py")
+    return SpeciesLearnsets.load(path)
+
+
+# Text of one level up entry's levels: "12", "12, 30" or "GS 12 / C 15" when the versions differ
+def levels_text(levels):
+    if levels and isinstance(levels[0], list):
+        if all(version_levels == levels[0] for version_levels in levels):
+            levels = levels[0]
+        else:
+            return " / ".join(f"{version} {', '.join(map(str, version_levels)) or '-'}"
+                              for version, version_levels in zip(versions, levels))
+    return ", ".join(map(str, levels))
+
+
+# Looks up a Pokémon's learnset with the given command line arguments
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="List every move one Pokémon can learn, by method")
+    arg_parser.add_argument("pokemon", help="the Pokémon's name (any letter case)")
+    arg_parser.add_argument("--method", action="append", choices=methods, dest="methods",
+                            help="only list this way of learning moves (can be given more than once)")
+    arg_parser.add_argument("--version", choices=versions,
+                            help="only list what can be learned in this game version: GS (Gold/Silver) or C "
+                                 "(Crystal)")
+    arg_parser.add_argument("--max-level", type=int, help="only list level up moves learned at this level or below")
+    arg_parser.add_argument("--json", action="store_true", help="print the learnset as JSON")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        index = load_species_learnsets()
+        name = index.name(args.pokemon)
+        learnset = index.learnset(name, args.methods, args.version, args.max_level)
+    except KeyError as error:
+        arg_parser.error(error.args[0])
+    except FileNotFoundError as error:
+        arg_parser.error(str(error))
+
+    if args.json:
+        print(json.dumps({"pokemon": name, "moves": learnset}, ensure_ascii=False, indent=4))
+        return
+
+    print(name)
+    for method, entries in learnset.items():
+        print(f"\n{method_sections[method]} ({len(entries)})")
+        for entry in entries:
+            if isinstance(entry, dict):
+                print(f"  {entry['Move']:<16} Lv. {levels_text(entry['Levels'])}")
+            else:
+                print(f"  {entry}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# Table of every species seen in the learnset tables, with the columns serebii shows on
+# each row: national dex number, types and base stats. The crawler keeps these columns in
+# the move records (MoveRecord.species), and build_artifacts.py merges them into one row
+# per species, stored column by column in docs/species_table.json:
+#   {"stats": [stat names], "dex": [...], "name": [...], "types": [[...], ...],
+#    "HP": [...], "Attack": [...], ..., "Speed": [...]}
+# The rows are sorted by national dex number and the row number is the species ID.
+#
+# The committed docs/species_table.json was NOT built from crawled serebii rows: it was
+# imported from Pokémon Showdown's Gen II data (its data/mods/gen2 pokedex, with the Gen II
+# types and stats, e.g. Clefairy is Normal and Magnemite Electric/Steel), because the move
+# records in the repository were crawled before the species columns were kept:
+#   python species_table.py --import-showdown gen2pokedex.json
+# A table built from crawled rows is checked against the committed one before it replaces
+# it (see compare_species_tables), so a misread column can't slip into the filters.
+#
+# Queries filter on these columns with masks: a predicate like "Speed >= 80" is checked
+# once down its column, and the result is turned into a bitset over the species of the
+# learnset index (or a boolean column mask for the NumPy matrix in batch_query.py), which
+# is then ANDed with the learners of the moves.
+#   python query_moves.py Surf "Ice Beam" --type Water --stat "Speed>=80"
+
+import argparse
+import functools
+import json
+import operator
+import os
+import re
+from collections import namedtuple
+
+from build_manifest import load_manifest, save_manifest, write_if_changed
+from learnset_index import load_index, move_data_path
+from species_learnsets import species_key
+
+# Where the table is written
+species_table_path = os.path.join(os.path.dirname(move_data_path), "species_table.json")
+
+# Base stats in the order of the dextable columns (Gold/Silver split Special into Special
+# Attack and Special Defense). Kept here rather than with the crawling code so the query
+# tools can read stat filters without importing requests and BeautifulSoup
+stat_names = ["HP", "Attack", "Defense", "Sp. Attack", "Sp. Defense", "Speed"]
+
+# The 17 types of Gen II
+type_names = ["Normal", "Fire", "Water", "Electric", "Grass", "Ice", "Fighting", "Poison", "Ground", "Flying",
+              "Psychic", "Bug", "Rock", "Ghost", "Dragon", "Dark", "Steel"]
+
+# Showdown's base stat keys, in the order of stat_names
+showdown_stats = ["hp", "atk", "def", "spa", "spd", "spe"]
+
+# One species row from a source other than a crawled record (same fields as SpeciesRow)
+TableRow = namedtuple("TableRow", ["dex", "pokemon", "types", "stats"])
+
+# Comparisons a stat filter can use (longest first, so ">=" isn't read as ">")
+comparisons = {">=": operator.ge, "<=": operator.le, "!=": operator.ne, "=": operator.eq,
+               ">": operator.gt, "<": operator.lt}
+
+
+# Builds the table from MoveRecords. A species gets the first row seen for it. Returns
+# the table as a dictionary of columns (empty columns if no record has species rows)
+def build_species_table(records):
+    rows = {}
+    for record in records:
+        for row in record.species or []:
+            rows.setdefault(row.pokemon, row)
+    return table_from_rows(rows.values())
+
+
+# Turns species rows (anything with dex, pokemon, types and stats) into the table columns
+def table_from_rows(rows):
+    ordered = sorted(rows, key=lambda row: row.dex)
+    table = {
+        "stats": stat_names,
+        "dex": [row.dex for row in ordered],
+        "name": [row.pokemon for row in ordered],
+        "types": [row.types for row in ordered],
+    }
+    for i, stat in enumerate(stat_names):
+        table[stat] = [row.stats[i] for row in ordered]
+    return table
+
+
+# Builds the table from a Pokémon Showdown pokedex ({id: {"num", "name", "types",
+# "baseStats"}}) for the species named in names (spelled as in the learnset data).
+# Raises KeyError if one of them isn't in the pokedex
+def table_from_showdown(pokedex, names):
+    entries = {}
+    for entry in pokedex.values():
+        # Alternate formes (megas, regional forms) share the number of the base species
+        if not entry.get("forme"):
+            entries.setdefault(species_key(entry["name"]), entry)
+    rows = []
+    for name in names:
+        entry = entries.get(species_key(name))
+        if entry is None:
+            raise KeyError(f'Pokémon "{name}" is not in the Showdown pokedex')
+        rows.append(TableRow(entry["num"], name, list(entry["types"]),
+                             [entry["baseStats"][key] for key in showdown_stats]))
+    return table_from_rows(rows)
+
+
+# Differences between two tables, for the species in both: a list of
+# (species, column, value in table, value in reference)
+def compare_species_tables(table, reference):
+    reference_rows = {name: row for row, name in enumerate(reference["name"])}
+    differences = []
+    for row, name in enumerate(table["name"]):
+        reference_row = reference_rows.get(name)
+        if reference_row is None:
+            continue
+        for column in ["dex", "types"] + stat_names:
+            if table[column][row] != reference[column][reference_row]:
+                differences.append((name, column, table[column][row], reference[column][reference_row]))
+    return differences
+
+
+# Key a stat name is matched by ("Sp. Attack", "sp attack", "spattack" -> "spattack")
+def stat_key(name):
+    return re.sub(r"[^a-z]", "", name.lower())
+
+
+# Reads a stat filter like "Speed>=80" or "sp. attack < 100" into (stat name, comparison
+# symbol, value). Raises ValueError for a filter that can't be read
+def parse_stat_filter(text):
+    for symbol in comparisons:
+        stat, found, value = text.partition(symbol)
+        if found:
+            keys = {stat_key(name): name for name in stat_names}
+            if stat_key(stat) not in keys:
+                raise ValueError(f'Unknown stat "{stat.strip()}", expected one of {stat_names}')
+            try:
+                return keys[stat_key(stat)], symbol, int(value)
+            except ValueError:
+                raise ValueError(f'Stat filter "{text}" needs a whole number after {symbol}')
+    raise ValueError(f'Stat filter "{text}" needs a comparison ({", ".join(comparisons)})')
+
+
+class SpeciesTable:
+    def __init__(self, table):
+        self.columns = table
+        self.names = table["name"]
+        # Species name -> row (species ID)
+        self.ids = {name: species_id for species_id, name in enumerate(self.names)}
+        # National dex number -> row
+        self.dex_ids = {dex: species_id for species_id, dex in enumerate(table["dex"])}
+        # Lower case type name -> bitset over the rows of the species that have it
+        self.type_masks = {}
+        for species_id, types in enumerate(table["types"]):
+            for type_name in types:
+                self.type_masks[type_name.lower()] = self.type_masks.get(type_name.lower(), 0) | 1 << species_id
+
+    def __len__(self):
+        return len(self.names)
+
+    # Reads the table from a species_table.json file
+    @classmethod
+    def load(cls, path=species_table_path):
+        with open(path, "r") as file:
+            return cls(json.load(file))
+
+    # Row of a species by national dex number, or None
+    def by_dex(self, dex):
+        return self.dex_ids.get(dex)
+
+    # Bitset over the rows of the species that have every one of the types and pass every
+    # stat filter ((stat name, comparison symbol, value) as from parse_stat_filter)
+    def row_mask(self, types=(), stat_filters=()):
+        mask = (1 << len(self)) - 1
+        for type_name in types:
+            mask &= self.type_masks.get(type_name.lower(), 0)
+        for stat, symbol, value in stat_filters:
+            compare = comparisons[symbol]
+            column_mask = 0
+            for species_id, stat_value in enumerate(self.columns[stat]):
+                if compare(stat_value, value):
+                    column_mask |= 1 << species_id
+            mask &= column_mask
+        return mask
+
+    # The same filter as a bitset over another set of species IDs (name -> ID, e.g.
+    # LearnsetIndex.species_ids). Species that aren't in the table never match
+    def species_mask(self, species_ids, types=(), stat_filters=()):
+        rows = self.row_mask(types, stat_filters)
+        mask = 0
+        for name, species_id in species_ids.items():
+            row = self.ids.get(name)
+            if row is not None and rows >> row & 1:
+                mask |= 1 << species_id
+        return mask
+
+
+# The table from docs/species_table.json, read the first time it is needed. Raises
+# FileNotFoundError if it hasn't been built yet
+@functools.lru_cache(maxsize=None)
+def load_species_table(path=species_table_path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} hasn't been built yet: crawl the move pages again (the species "
+                                f"columns are kept since then) and run build_artifacts.py")
+    return SpeciesTable.load(path)
+
+
+# Writes the table from a Showdown pokedex file, for every species of the learnset data
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build docs/species_table.json from a Pokémon Showdown pokedex")
+    arg_parser.add_argument("--import-showdown", metavar="FILE", required=True,
+                            help="Showdown Gen II pokedex as JSON ({id: {num, name, types, baseStats}})")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.import_showdown, "r", encoding="utf-8") as file:
+        pokedex = json.load(file)
+    try:
+        table = table_from_showdown(pokedex, load_index().species)
+    except KeyError as error:
+        arg_parser.error(error.args[0])
+
+    manifest = load_manifest()
+    written = write_if_changed(species_table_path, json.dumps(table, ensure_ascii=False, separators=(",", ":")),
+                               manifest)
+    save_manifest(manifest)
+    load_species_table.cache_clear()
+    print(f"{len(table['name'])} species in {species_table_path}" + ("" if written else " (unchanged)"))
+
+
+if __name__ == "__main__":
+    main()
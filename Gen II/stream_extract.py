@@ -0,0 +1,408 @@
+# Streaming version of the page extraction (extract_move.py --streaming). Instead of
+# downloading the whole page and building a BeautifulSoup tree of it, the page is fed to
+# an incremental tokenizer (Python's html.parser) a chunk at a time as it comes in:
+#   - outside the dextable tables only the section anchors and the text right after them
+#     are looked at, nothing is kept
+#   - inside a dextable only the text and images of the "fooinfo" cells are kept, and each
+#     table is turned into learnset rows as soon as it ends
+#   - once the special event table (always the last learnset table on the page) has been
+#     read, the rest of the page is not read at all (the download is closed)
+# So the memory a page needs is one chunk, whatever text the tokenizer is holding on to
+# and the rows of the table being read, however large the page is. The result is the same
+# MoveRecord extract_sections() gives for the page, as long as the sections keep serebii's
+# order: a section whose table came after the event table would not be seen.
+#
+#   python stream_extract.py --benchmark   # peak memory of both ways on bigger and bigger pages
+#   python stream_extract.py --check       # same record as the soup for any chunk size, on every page
+
+import argparse
+import codecs
+import hashlib
+import sys
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from html.parser import HTMLParser
+
+import fetch_layer
+import page_archive
+from extract_helper_funcs import (MoveRecord, build_move_text, classify_TM_anchor, make_soup, extract_sections,
+                                  parse_levelup_rows, parse_name_rows)
+from fetch_layer import InvalidPage
+from generations import gen2
+
+# Characters handed to the tokenizer at a time
+chunk_size = 16384
+
+# Chunk sizes --check reads each page with: one character at a time, small and odd sizes
+# (so chunks end inside names, labels and tags), and the size used for crawling
+check_chunk_sizes = [1, 7, 1000, chunk_size]
+
+
+# Stands in for a BeautifulSoup <img> tag: only its attributes are kept
+class StreamImage:
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+
+# Stands in for a BeautifulSoup "fooinfo" cell, with just the get_text and find_all("img")
+# the row parsers in extract_helper_funcs.py use
+class StreamCell:
+    def __init__(self):
+        self.strings = []
+        self.images = []
+
+    def get_text(self, strip=False):
+        if strip:
+            return "".join(string.strip() for string in self.strings)
+        return "".join(self.strings)
+
+    def find_all(self, name):
+        return self.images if name == "img" else []
+
+
+class SectionStreamParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.record = MoveRecord()
+        # Species columns of every row read, by name
+        self.species = {}
+        # Same bookkeeping as extract_sections: sections whose anchor was seen but whose
+        # table hasn't been reached yet, and "TM" anchors waiting for the text after them
+        self.pending_sections = []
+        self.unlabeled_anchors = 0
+        self.seen_level = False
+        self.seen_egg = False
+        # The dextable being read: the sections it is read for, "TM" anchors that are
+        # labeled by its first string, how deep inside it we are, and its rows so far
+        self.table = None
+        self.table_depth = 0
+        self.row = None
+        self.cell = None
+        # True once everything needed has been read
+        self.done = False
+        # Pieces of the text node being read. The tokenizer hands text over as soon as it
+        # has it, so one text node can come in several pieces (split where a chunk ends);
+        # they are joined into one string before it is used, like BeautifulSoup does
+        self.text_pieces = []
+
+    # Passes on the text node read so far as one string. Called before every other token
+    def flush_text(self):
+        if not self.text_pieces:
+            return
+        data = "".join(self.text_pieces)
+        self.text_pieces = []
+        self.handle_string(data)
+        if self.cell is not None:
+            self.cell.strings.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush_text()
+        if self.done:
+            return
+        attrs = dict(attrs)
+
+        if self.table is not None:
+            if tag == "table":
+                self.table_depth += 1
+            elif tag == "tr":
+                self.row = []
+                self.table["rows"].append(self.row)
+                self.cell = None
+            elif tag == "td":
+                self.cell = None
+                if self.row is not None and "fooinfo" in (attrs.get("class") or "").split():
+                    self.cell = StreamCell()
+                    self.row.append(self.cell)
+            elif tag == "img" and self.cell is not None:
+                self.cell.images.append(StreamImage(attrs))
+
+        if tag == "a":
+            anchor_name = attrs.get("name")
+            if anchor_name == "level" and not self.seen_level:
+                self.seen_level = True
+                self.pending_sections.append("levelup")
+            elif anchor_name == "egg" and not self.seen_egg:
+                self.seen_egg = True
+                self.pending_sections.append("breeding")
+            elif anchor_name == "TM":
+                self.unlabeled_anchors += 1
+
+        elif tag == "table" and self.table is None and "dextable" in (attrs.get("class") or "").split():
+            # The anchors waiting for a label are labeled by the table's first string
+            self.table = {"sections": self.pending_sections, "unlabeled": self.unlabeled_anchors,
+                          "first_string": None, "rows": []}
+            self.pending_sections = []
+            self.unlabeled_anchors = 0
+            self.table_depth = 1
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+        if self.done or self.table is None:
+            return
+        if tag == "td":
+            self.cell = None
+        elif tag == "tr":
+            self.row = None
+            self.cell = None
+        elif tag == "table":
+            self.table_depth -= 1
+            if not self.table_depth:
+                self.finish_table()
+
+    def handle_data(self, data):
+        self.text_pieces.append(data)
+
+    # Comments count as strings for labeling anchors, like in the soup walk
+    def handle_comment(self, data):
+        self.flush_text()
+        self.handle_string(data)
+
+    def handle_decl(self, decl):
+        self.flush_text()
+
+    def handle_pi(self, data):
+        self.flush_text()
+
+    def unknown_decl(self, data):
+        self.flush_text()
+
+    # Also passes on the text at the very end of the page
+    def close(self):
+        super().close()
+        self.flush_text()
+
+    def handle_string(self, data):
+        if self.done:
+            return
+        if self.table is not None:
+            if self.table["first_string"] is None:
+                self.table["first_string"] = data
+        elif self.unlabeled_anchors:
+            label = classify_TM_anchor(data.strip())
+            if label:
+                self.pending_sections.extend([label] * self.unlabeled_anchors)
+            self.unlabeled_anchors = 0
+
+    # Turns the table that just ended into learnset rows for each section waiting for it
+    def finish_table(self):
+        table, self.table = self.table, None
+        self.row = None
+        self.cell = None
+
+        sections = table["sections"]
+        if table["unlabeled"]:
+            label = classify_TM_anchor((table["first_string"] or "").strip())
+            if label:
+                sections = sections + [label] * table["unlabeled"]
+
+        # Skip the two header rows, as the soup parsers do
+        rows = table["rows"][2:]
+        for section in dict.fromkeys(sections):
+            if section == "levelup":
+                self.record.levelup = parse_levelup_rows(rows, self.species)
+            else:
+                setattr(self.record, section, parse_name_rows(rows, self.species))
+
+        # The special event table is the last learnset table on a serebii page (level up,
+        # TM/HM, breeding, then events), so nothing after it is needed
+        if "event" in sections:
+            self.done = True
+
+    # The record for everything read so far
+    def result(self):
+        # Anchors that never got a table after them still mark the section as present
+        for section in self.pending_sections:
+            if getattr(self.record, section) is None:
+                setattr(self.record, section, [])
+        self.record.species = list(self.species.values())
+        return self.record
+
+
+# What extract_stream gives back: the MoveRecord, a hash of the text that was read (the
+# same page always gives the same hash), the characters read, the most characters the
+# tokenizer had to work on at once, whether the page was read far enough to trust the record
+# (everything needed was found, or the page was read to its </html>), and the seconds
+# spent in the tokenizer (not waiting for the next chunk to arrive)
+StreamResult = namedtuple("StreamResult", ["record", "page_hash", "read", "peak_buffer", "complete", "seconds",
+                                           "retries"], defaults=[0])
+
+
+# Reads a page from an iterator of text chunks, stopping as soon as the parser has
+# everything it needs. Returns a StreamResult
+def extract_stream(chunks):
+    parser = SectionStreamParser()
+    page_hash = hashlib.sha256()
+    read = 0
+    peak_buffer = 0
+    tail = ""
+    seconds = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        if isinstance(chunk, bytes):
+            raise TypeError("extract_stream needs text chunks, not bytes")
+        page_hash.update(chunk.encode("utf-8"))
+        read += len(chunk)
+        tail = (tail + chunk)[-2000:]
+        # The chunk plus whatever the tokenizer kept of the last one (an unfinished tag)
+        peak_buffer = max(peak_buffer, len(parser.rawdata) + len(chunk))
+        parser.feed(chunk)
+        seconds += time.perf_counter() - start
+        if parser.done:
+            break
+    else:
+        parser.close()
+    complete = parser.done or "</html>" in tail.lower()
+    return StreamResult(parser.result(), page_hash.hexdigest(), read, peak_buffer, complete, seconds)
+
+
+# Checks a streamed move page the way fetch_layer.validate_move_page checks a whole one:
+# raises InvalidPage (so the page is fetched again) if it had no learnset section or was
+# cut off before everything needed was read
+def validate_move_stream(result):
+    record = result.record
+    if all(section is None for section in (record.levelup, record.TM, record.breeding, record.event)):
+        raise InvalidPage("no learnset sections on the page")
+    if not result.complete:
+        raise InvalidPage("page ends before </html> (cut off response)")
+
+
+# Splits a text into chunks (for pages that are already in memory, e.g. from the archive)
+def text_chunks(text, size=chunk_size):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+# Decodes an iterator of byte chunks into text chunks
+def decode_chunks(byte_chunks, encoding="utf-8"):
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+# Largest tokenizer input seen by each worker thread (thread name -> characters), for the
+# report at the end of a crawl
+worker_peaks = {}
+worker_peaks_lock = threading.Lock()
+
+
+# Records the tokenizer input of one page for the calling worker thread
+def note_worker_peak(peak_buffer):
+    name = threading.current_thread().name
+    with worker_peaks_lock:
+        worker_peaks[name] = max(worker_peaks.get(name, 0), peak_buffer)
+
+
+# One line per worker: the most characters its tokenizer had to work on at once
+def worker_peak_report():
+    with worker_peaks_lock:
+        return "\n".join(f"{name:<28} peak tokenizer buffer {peak / 1024:8.1f} KB"
+                         for name, peak in sorted(worker_peaks.items()))
+
+
+# Streams a move page (through page_archive.stream_page) and returns the same as
+# parse_page (the record JSON, its text file contents if with_text, the seconds spent
+# parsing) plus the StreamResult. With a profiler (crawl_metrics.ParseProfiler) the page's
+# chunks are downloaded first and only the extraction is run under the profiler, so the
+# profile doesn't include the download and downloads don't wait on the profiler's lock
+# (the memory bound doesn't hold while profiling)
+def parse_page_stream(move, move_name, url, session=None, with_text=False, profiler=None):
+    consume = (lambda chunks: profiler.run(extract_stream, list(chunks))) if profiler else extract_stream
+    result, retries = page_archive.stream_page(url, session, consume, validate_move_stream, chunk_size,
+                                               fetch_layer.validate_move_page, with_retries=True)
+    result = result._replace(retries=retries)
+    note_worker_peak(result.peak_buffer)
+    start = time.perf_counter()
+    record_json = result.record.to_json(move, move_name)
+    text = build_move_text(move_name, result.record) if with_text else None
+    return record_json, text, result.seconds + time.perf_counter() - start, result
+
+
+# Peak memory (bytes, from tracemalloc) of extracting a page with the soup and with the
+# streaming extractor, on the page padded with the given number of filler characters
+# before and after its tables
+def measure_peaks(html, padding):
+    filler = "<p>" + "x" * 70 + "</p>\n"
+    body_at = html.find("<body")
+    body_at = html.find(">", body_at) + 1 if body_at >= 0 else 0
+    padded = html[:body_at] + filler * (padding // len(filler)) + html[body_at:]
+    padded = padded.replace("</body>", filler * (padding // len(filler)) + "</body>")
+
+    peaks = {}
+    for name, extract in [("soup", lambda: extract_sections(make_soup(padded))),
+                          ("stream", lambda: extract_stream(text_chunks(padded)).record)]:
+        tracemalloc.start()
+        record = extract()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peaks[name + "_record"] = record
+    return len(padded), peaks
+
+
+# Prints the peak memory of both ways of extracting the same page at growing page sizes
+def benchmark(move="tackle"):
+    html = page_archive.get_page(gen2.page_url(move))
+    print(f"{'page size':>12} {'soup peak':>12} {'stream peak':>12}  same record")
+    for padding in [0, 250_000, 1_000_000, 4_000_000]:
+        size, peaks = measure_peaks(html, padding)
+        same = peaks["soup_record"] == peaks["stream_record"]
+        print(f"{size / 1e6:9.2f} MB {peaks['soup'] / 1e6:9.2f} MB {peaks['stream'] / 1e6:9.2f} MB  {same}")
+
+
+# Chunk sizes at which streaming a page gives a different record than extract_sections
+# on the whole page (an empty list if it never does)
+def check_page(html, sizes=check_chunk_sizes):
+    expected = extract_sections(make_soup(html))
+    return [size for size in sizes if extract_stream(text_chunks(html, size)).record != expected]
+
+
+# Checks every page of the move list (or the given moves) with check_page and prints the
+# pages that don't match. Returns the number of pages that don't match
+def check_pages(moves=None, sizes=check_chunk_sizes):
+    from move_registry import load_move_names
+
+    mismatches = 0
+    for move in moves or load_move_names():
+        bad_sizes = check_page(page_archive.get_page(gen2.page_url(move)), sizes)
+        if bad_sizes:
+            mismatches += 1
+            print(f"{move}: different record with chunks of {', '.join(map(str, bad_sizes))} characters")
+    return mismatches
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare streaming and soup extraction")
+    arg_parser.add_argument("--benchmark", action="store_true", help="run the memory benchmark")
+    arg_parser.add_argument("--check", action="store_true",
+                            help="check that every page gives the soup's record whatever the chunk size")
+    arg_parser.add_argument("--move", action="append", dest="moves",
+                            help="move page to use (can be given more than once; default: tackle for the "
+                                 "benchmark, every move for the check)")
+    arg_parser.add_argument("--archive-mode", help="page archive mode (off, record or replay)")
+    arg_parser.add_argument("--archive", help="path of the page archive file")
+    args = arg_parser.parse_args(argv)
+
+    if not args.benchmark and not args.check:
+        arg_parser.print_help()
+        return
+    page_archive.configure(args.archive_mode, args.archive)
+    if args.benchmark:
+        benchmark((args.moves or ["tackle"])[0])
+    if args.check:
+        mismatches = check_pages(args.moves)
+        print(f"{mismatches} page(s) give a different record when streamed")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,129 @@
-// List to store all moves so they can be accessed for typeahead
-let move_list = [];
+// Move name index (built by get_gen2_movelist.py): display names, a normalized key for
+// every spelling of each move, the keys sorted for prefix search, and one-letter deletions
+// of each key for catching typos
+let move_index = {moves: [], aliases: {}, prefixes: [], deletes: {}};
 
-// List to store data about each move (which Pokemon can learn the move and by which method)
-let move_data;
+// Shard manifest (which file holds each move's data), fetched the first time a search is made
+let shard_manifest;
 
-// Pull the move names from the .json file containing all move names
-fetch("movelist.json")
+// Data about each move that has been fetched so far (which Pokemon can learn the move).
+// Only the moves the user actually searches for are downloaded, one small file each
+const move_data = {};
+
+// Pull the move name index from its .json file
+fetch("move_index.json")
     .then(response => response.json())
     .then(data => {
-        // Store in the list for access
-        move_list = data;
+        // Store for access
+        move_index = data;
     })
     // Catch errors when pulling .json file
     .catch(error => console.error("Error loading move names:", error));
 
-// Pull the move data from the other json file
-fetch("movedata_namesonly.json")
-    .then(response => response.json()).then(data => {
-        move_data = data
-    })
-    // Catch error when pulling from .json file
-    .catch(error => console.error("Error loading move data:", error));
+// Reduce a move name to its key: lower case letters and digits only, so "Sand-Attack",
+// "sand attack" and "sandattack" are all the same move
+function normalizeName(name) {
+    return name.toLowerCase().replace(/[^a-z0-9]/g, "");
+}
+
+// Find the moves whose key starts with the query, using a binary search on the sorted keys
+// (instead of checking every move on each keystroke)
+function movesWithPrefix(query) {
+    const key = normalizeName(query);
+    const prefixes = move_index.prefixes;
+
+    // Find the first key that is not smaller than the query
+    let low = 0;
+    let high = prefixes.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (prefixes[middle][0] < key) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+
+    // Every key from there on that starts with the query is a match
+    const matches = [];
+    for (let i = low; i < prefixes.length && prefixes[i][0].startsWith(key); i++) {
+        const move = move_index.moves[prefixes[i][1]];
+        if (!matches.includes(move)) {
+            matches.push(move);
+        }
+    }
+    return matches;
+}
+
+// Turn whatever the user typed into the move's display name. Any spelling of the name
+// works, and a name with one typo (a missing, extra, wrong or swapped letter) is
+// corrected if it can only be one move. Returns null if the move can't be found
+function resolveMove(name) {
+    const key = normalizeName(name);
+    if (key in move_index.aliases) {
+        return move_index.moves[move_index.aliases[key]];
+    }
+
+    // Moves that share a one-letter deletion with the name are the ones it could be a typo of
+    const deletions = [...key].map((_, i) => key.slice(0, i) + key.slice(i + 1));
+    const candidates = new Set(move_index.deletes[key] || []);
+    deletions.forEach(deleted => {
+        if (deleted in move_index.aliases) {
+            candidates.add(move_index.aliases[deleted]);
+        }
+        (move_index.deletes[deleted] || []).forEach(id => candidates.add(id));
+    });
+
+    // Sharing a deletion isn't enough ("abc" and "bca" both give "bc" but are two edits
+    // apart), so only keep the moves really one typo away, as fuzzy_matches in
+    // move_registry.py does
+    const matches = [...candidates].filter(id =>
+        Math.min(editDistance(key, normalizeName(move_index.moves[id])),
+                 editDistance(key, normalizeName(move_index.slugs[id]))) <= 1);
+    return matches.length === 1 ? move_index.moves[matches[0]] : null;
+}
+
+// Edit distance between two strings, where swapping two neighbouring letters counts as one
+// edit (the same as edit_distance in move_registry.py)
+function editDistance(first, second) {
+    // distances[i][j] is the distance between the first i letters of first and the first j of second
+    const distances = [];
+    for (let i = 0; i <= first.length; i++) {
+        distances.push([]);
+        for (let j = 0; j <= second.length; j++) {
+            distances[i].push(i === 0 || j === 0 ? i + j : 0);
+        }
+    }
+    for (let i = 1; i <= first.length; i++) {
+        for (let j = 1; j <= second.length; j++) {
+            distances[i][j] = Math.min(distances[i - 1][j] + 1, distances[i][j - 1] + 1,
+                                       distances[i - 1][j - 1] + (first[i - 1] !== second[j - 1] ? 1 : 0));
+            if (i > 1 && j > 1 && first[i - 1] === second[j - 2] && first[i - 2] === second[j - 1]) {
+                distances[i][j] = Math.min(distances[i][j], distances[i - 2][j - 2] + 1);
+            }
+        }
+    }
+    return distances[first.length][second.length];
+}
+
+// Fetch the data for the given moves (only the ones not fetched yet). Each move has its own
+// file listed in shards/manifest.json; its hash is added to the URL so the browser reuses
+// its cached copy until the file changes
+async function loadMoves(moves) {
+    if (!shard_manifest) {
+        shard_manifest = await fetch("shards/manifest.json").then(response => response.json());
+    }
+
+    await Promise.all(moves.map(async (move) => {
+        const entry = shard_manifest.moves[move];
+        // Unknown moves are reported when the results are worked out
+        if (!entry || move in move_data) {
+            return;
+        }
+        const shard = await fetch(`shards/${entry.file}?v=${entry.hash}`).then(response => response.json());
+        move_data[move] = shard.learners;
+    }));
+}
 
 // Function for autocomplete/typeahead in move input fields
 document.addEventListener("DOMContentLoaded", () => {
@@ -48,11 +151,8 @@ document.addEventListener("DOMContentLoaded", () => {
                 return;
             }
 
-            // Filter moves based on the input query. Convert to lowercase again for case-insensitive
-            // input matching
-            const filteredMoves = move_list.filter(move =>
-                move.toLowerCase().startsWith(query)
-            );
+            // Find the moves starting with the input query (case, spaces and hyphens are ignored)
+            const filteredMoves = movesWithPrefix(query);
 
             // Display matching suggestions (loop through each matching suggestion)
             filteredMoves.forEach(move => {
@@ -89,7 +189,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
 
 // Function to handle the form submission
-document.getElementById("move-form").addEventListener("submit", (event) => {
+document.getElementById("move-form").addEventListener("submit", async (event) => {
     // Prevent form from reloading the page upon submission
     event.preventDefault();
 
@@ -100,7 +200,9 @@ document.getElementById("move-form").addEventListener("submit", (event) => {
     const move4 = document.getElementById("move4").value;
 
     // Put moves in array and remove any empty inputs with .filter(Boolean)
-    const moves = [move1, move2, move3, move4].filter(Boolean); 
+    // Each move is turned into its display name (so any spelling or a small typo works),
+    // keeping what was typed if it isn't a known move
+    const moves = [move1, move2, move3, move4].filter(Boolean).map(move => resolveMove(move) || move);
 
     // If the length of the moves array is 0, then this means the user did not enter 
     // a move. In this case, prompt them to enter at least one move
@@ -109,7 +211,13 @@ document.getElementById("move-form").addEventListener("submit", (event) => {
         return;
     }
 
-    // Find Pokémon that can learn the moves using helper function
+    // Download the data for the selected moves, then find Pokémon that can learn the
+    // moves using helper function
+    try {
+        await loadMoves(moves);
+    } catch (error) {
+        console.error("Error loading move data:", error);
+    }
     const results = findCommonPokemon(moves);
 
     // Display the results by creating a new <div>